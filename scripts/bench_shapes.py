@@ -0,0 +1,65 @@
+"""
+Micro-benchmark of the shape templates of the visualizer, against formatting
+the shape dictionaries of each transition with _shape_to_svg.
+Checks that both produce the same svg for every style and transition.
+
+Usage: python3 scripts/bench_shapes.py [repeat]
+"""
+
+import sys
+from itertools import product
+from timeit import timeit
+
+from sootty import Style, Visualizer
+from sootty.exceptions import SoottyInternalError
+
+ValueType = Visualizer.ValueType
+
+STYLES = [Style.Default, Style.Light, Style.Silicon, Style.Colorful]
+
+# Arguments of the transitions: (left, top, run, value).
+ARGUMENTS = [(84.0, 45, 100.0, 3), (86.66666666666667, 285, 2.6666666666666665, 41)]
+
+
+def transitions(visualizer):
+    """Yields the (prev_type, value_type, changing) transitions of a style."""
+    for prev_type, value_type, changing in product(ValueType, ValueType, (0, 1)):
+        try:
+            visualizer._template(prev_type, value_type, bool(changing))
+        except SoottyInternalError:  # not drawn, e.g. from DATA to HIGH
+            continue
+        yield prev_type, value_type, bool(changing)
+
+
+def dictionaries(visualizer, cases):
+    for transition, arguments in cases:
+        shapes = visualizer._shapes(*transition, visualizer._coordinates(*arguments))
+        "".join(map(visualizer._shape_to_svg, shapes))
+
+
+def templates(visualizer, cases):
+    for transition, arguments in cases:
+        visualizer._template(*transition)(*arguments)
+
+
+def main(repeat=200):
+    for style in STYLES:
+        visualizer = Visualizer(style)
+        cases = list(product(transitions(visualizer), ARGUMENTS))
+        for transition, arguments in cases:
+            at = visualizer._coordinates(*arguments)
+            shapes = visualizer._shapes(*transition, at)
+            expected = "".join(map(visualizer._shape_to_svg, shapes))
+            assert visualizer._template(*transition)(*arguments) == expected
+        before = timeit(lambda: dictionaries(visualizer, cases), number=repeat)
+        after = timeit(lambda: templates(visualizer, cases), number=repeat)
+        shapes = repeat * len(cases)
+        print(
+            f"{style.__name__:10} {len(cases):3} cases: "
+            f"{before / shapes * 1e6:6.2f}us dictionaries, "
+            f"{after / shapes * 1e6:6.2f}us templates ({before / after:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -33,4 +33,7 @@ setuptools.setup(
         'sortedcontainers>=2.4',
         'PyYAML>=6.0'
     ],
+    extras_require={
+        'numpy': ['numpy>=1.20'],
+    },
 )
\ No newline at end of file
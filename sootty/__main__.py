@@ -1,11 +1,15 @@
 import argparse
 import sys
+import time
 
 from .exceptions import SoottyError
+from .parser import parser
 from .save import save_query, reload_query
 from .storage import WireTrace
 from .visualizer import Visualizer
 
+FOLLOW_INTERVAL = 1.0  # seconds between checks for changes appended to a followed file
+
 
 def parse_args():
     parser = argparse.ArgumentParser(
@@ -95,6 +99,25 @@ def parse_args():
         metavar="SAVENAME",
         help="Loads a saved query. Requires query name as string.",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        metavar="N",
+        dest="jobs",
+        help="number of processes used to parse large wiretraces",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="load or save the whole parsed wiretrace in a FILENAME.sootty file",
+    )
+    parser.add_argument(
+        "-f",
+        "--follow",
+        action="store_true",
+        help="keep displaying changes appended to a .vcd file by a running simulation",
+    )
 
     args = parser.parse_args()
     if args.save is not None and args.reload is not None:
@@ -118,22 +141,106 @@ def parse_args():
         args.end,
         args.output,
         args.radix,
+        args.jobs,
+        args.cache,
+        args.follow,
     )
 
 
+def time_window(start, end, length, exprs):
+    """
+    Returns the times bounding the window when they are known before the trace
+    is loaded, i.e. the limits are time constants and no displayed expression
+    depends on values outside of the window. Returns None otherwise.
+    """
+    first = parser.time_constant(start) if start is not None else 0
+    if first is None or any(parser.is_temporal(expr) for expr in exprs if expr):
+        return None
+    if end is None:
+        return None if length is None else (first, first + length)
+    last = parser.time_constant(end)
+    return (first, last) if length is None and last is not None and last > first else None
+
+
 def main():
-    filename, wires, breakpoints, btable, length, start, end, output, radix = parse_args()
+    (
+        filename,
+        wires,
+        breakpoints,
+        btable,
+        length,
+        start,
+        end,
+        output,
+        radix,
+        jobs,
+        cache,
+        follow,
+    ) = parse_args()
 
     if filename is None:
         raise SoottyError("Input file is required. See --help for more info.")
+    if follow and not filename.endswith(".vcd"):
+        raise SoottyError("Only .vcd files can be followed.")
 
-    # Load vcd or evcd file into wiretrace object.
-    wiretrace = WireTrace.from_vcd(filename)
+    # Only load the wires referenced by the query, if the displayed wires are given.
+    names = None
+    if wires is not None:
+        names = set()
+        for exprs in (wires, start, end, breakpoints):
+            if exprs is not None:
+                names.update(parser.wire_names(exprs))
+
+    # Load vcd or evcd file into wiretrace object, from its cache if it was
+    # already parsed, or only parsing the displayed window of time if it can
+    # be known beforehand. A followed file is always parsed as a whole, so
+    # that the changes appended to it can be parsed later, and so is a file
+    # queried for breakpoints, which are listed over the whole trace.
+    window = None
+    if not follow and breakpoints is None:
+        window = time_window(start, end, length, (wires,))
+    if cache and not follow:
+        # The cache holds every wire of the whole trace, to be reused by any query.
+        names, window = None, None
+    wiretrace = WireTrace.from_vcd(
+        filename,
+        names=names,
+        start=window[0] if window else None,
+        end=window[1] if window else None,
+        jobs=jobs,
+        cache=cache and not follow,
+        cache_mmap=True,
+    )
 
     # Check that window bounds are well-defined.
     if end is not None and length is not None:
         raise SoottyError("Length and end flags should not be provided simultaneously.")
 
+    render(wiretrace, wires, breakpoints, btable, length, start, end, output, radix)
+
+    # Redraw the image whenever changes are appended to the file.
+    try:
+        while follow:
+            time.sleep(FOLLOW_INTERVAL)
+            if wiretrace.refresh():
+                render(
+                    wiretrace,
+                    wires,
+                    breakpoints,
+                    btable,
+                    length,
+                    start,
+                    end,
+                    output,
+                    radix,
+                )
+    except KeyboardInterrupt:
+        pass
+
+
+def render(wiretrace, wires, breakpoints, btable, length, start, end, output, radix):
+    """Evaluates the query on a wiretrace and displays or prints the resulting image."""
+
     # Calculate window bounds.
     if end is not None:
         if start is not None:
@@ -172,7 +279,8 @@ def main():
     if not output:
         image.display()  # Show image in terminal (works in kitty, iterm)
     else:
-        print(image.source)
+        image.write(sys.stdout)
+        print()
 
     if btable:
         wiretrace.print_breakpoints(breakpoints)
@@ -4,14 +4,39 @@ from re import match
 
 
 class VectorImage:
-    """Encapsulates logic to store and display an SVG to the terminal."""
+    """
+    Encapsulates logic to store and display an SVG to the terminal.
+
+    The source is either the svg string, or a function that renders the svg as
+    an iterator of fragments. A rendered image is written to its destination
+    fragment by fragment, so the whole document is never held in memory,
+    unless its `source` is read.
+    """
 
     def __init__(self, source):
-        self.source = source
+        self._source = None if callable(source) else source
+        self._render = source
+
+    @property
+    def source(self):
+        if self._source is None:
+            self._source = "".join(self._render())
+        return self._source
 
     def __str__(self):
         return self.source
 
+    def fragments(self):
+        """Returns an iterator over the fragments of the svg source."""
+        if self._source is None:
+            return self._render()
+        return iter((self._source,))
+
+    def write(self, file=sys.stdout):
+        """Writes the svg source to a text file, as it is rendered."""
+        for fragment in self.fragments():
+            file.write(fragment)
+
     def display(self):
         # TODO: fix!!! these lines are for hacking together width relative to display
         # result = match(r'<svg viewBox="0 0 (\d+) (\d+)".*', self.source)
@@ -21,4 +46,13 @@ class VectorImage:
         process = Popen(
             f"rsvg-convert -z 4 | viu -", shell=True, stdin=PIPE, stdout=sys.stdout
         )
-        process.communicate(input=str.encode(self.source))
+        try:
+            for fragment in self.fragments():
+                process.stdin.write(str.encode(fragment))
+        except BrokenPipeError:  # the viewer exited, e.g. if it is not installed
+            pass
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        process.wait()
@@ -0,0 +1,130 @@
+import json
+import os
+import re
+from bisect import bisect_right
+
+from .scanner import scan
+from .storage.logic import Logic
+
+INDEX_STEP = 1 << 22  # minimum number of bytes between two indexed time markers
+INDEX_POINTS = 1024  # maximum number of indexed time markers, for large files
+
+
+class TimeIndex:
+    """
+    Sparse index from the time markers of a vcd file to their byte offsets.
+
+    Each indexed point also stores the value of every signal that changed since
+    the previous point, so that a checkpoint of all signals can be rebuilt at
+    any point. The changes covering a window of time can then be loaded by
+    only parsing the file from the nearest point before the window. The index
+    is saved next to the vcd file, and is rebuilt when the file changes.
+    """
+
+    def __init__(self, points):
+        self.points = points  # list of (time, offset, changed values)
+        self.times = [point[0] for point in points]
+
+    @staticmethod
+    def path(filename):
+        return filename + ".idx"
+
+    @classmethod
+    def open(cls, filename, buffer, start):
+        """Loads the index of a vcd file, or builds and saves it if it is missing or stale."""
+        stat = os.stat(filename)
+        index = cls.load(filename, stat)
+        if index is None:
+            index = cls.build(buffer, start)
+            index.save(filename, stat)
+        return index
+
+    @classmethod
+    def load(cls, filename, stat):
+        """Loads the saved index of a vcd file, if it matches the size and mtime of the file."""
+        try:
+            with open(cls.path(filename), "r") as stream:
+                data = json.load(stream)
+        except (OSError, ValueError):
+            return None  # index is missing or unreadable
+        if data.get("size") != stat.st_size or data.get("mtime") != stat.st_mtime_ns:
+            return None
+        return cls(
+            [
+                (
+                    time,
+                    offset,
+                    {
+                        key.encode("latin-1"): Logic.from_str(value)
+                        if isinstance(value, str)
+                        else value
+                        for key, value in changes.items()
+                    },
+                )
+                for time, offset, changes in data["points"]
+            ]
+        )
+
+    def save(self, filename, stat):
+        """Saves the index next to the vcd file, along with the size and mtime of the file."""
+        # Values with x or z bits are saved as vcd bit strings.
+        points = [
+            (
+                time,
+                offset,
+                {
+                    key.decode("latin-1"): str(value)
+                    if isinstance(value, Logic)
+                    else value
+                    for key, value in changes.items()
+                },
+            )
+            for time, offset, changes in self.points
+        ]
+        try:
+            with open(self.path(filename), "w") as stream:
+                json.dump(
+                    {"size": stat.st_size, "mtime": stat.st_mtime_ns, "points": points},
+                    stream,
+                )
+        except OSError:
+            pass  # the index is only an optimization, e.g. for read-only directories
+
+    @classmethod
+    def build(cls, buffer, start, step=INDEX_STEP):
+        """Builds the index of the simulation section of a vcd buffer, starting at an offset."""
+        step = max(step, (len(buffer) - start) // INDEX_POINTS)
+        changes = dict()
+        appenders = {
+            ident: (lambda time, value, ident=ident: changes.__setitem__(ident, value))
+            for ident in re.findall(rb"\$var\s+\S+\s+\S+\s+(\S+)", buffer[:start])
+        }
+        points = [(0, start, dict())]
+        offset = start
+        while offset < len(buffer):
+            stop = buffer.find(b"\n#", offset + step)
+            if stop < 0:
+                break
+            stop += 1
+            scan(buffer, appenders, offset, stop)
+            time = int(buffer[stop : stop + 64].split(maxsplit=1)[0][1:])
+            points.append((time, stop, dict(changes)))
+            changes.clear()
+            offset = stop
+        return cls(points)
+
+    def seek(self, time):
+        """
+        Returns the offset and time of the last indexed point at or before a time,
+        along with the value of every signal at that point.
+        """
+        index = max(bisect_right(self.times, time) - 1, 0)
+        checkpoint = dict()
+        for point in self.points[: index + 1]:
+            checkpoint.update(point[2])
+        return self.points[index][1], self.points[index][0], checkpoint
+
+    def offset_after(self, time):
+        """Returns the offset of the first indexed point after a time, or None."""
+        index = bisect_right(self.times, time)
+        return self.points[index][1] if index < len(self.points) else None
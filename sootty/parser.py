@@ -62,6 +62,10 @@ class Prune(Visitor):
             tree.children = [tree.children[0], tree.children[2]]
 
 
+# Operators whose value at a point in time depends on other points in time.
+TEMPORAL = ("FROM", "AFTER", "UNTIL", "BEFORE", "NEXT", "PREV", "ACC")
+
+
 class ExpressionParser(Lark):
     """Implementation of Lark parser class for limit expressions."""
 
@@ -80,5 +84,28 @@ class ExpressionParser(Lark):
         tree = Prune().visit(tree)
         return tree.children
 
+    def time_constant(self, expression: str):
+        """Returns the time of an expression of the form "time N", or None otherwise."""
+        tree = self.parse(expression)
+        if isinstance(tree.data, Token) and tree.data.type == "TIME":
+            return int(tree.children[0])
+        return None
+
+    def is_temporal(self, expressions: str):
+        """Returns whether comma-separated expressions use a temporal operator."""
+        return any(
+            isinstance(node.data, Token) and node.data.type in TEMPORAL
+            for tree in self.parse_list(expressions)
+            for node in tree.iter_subtrees()
+        )
+
+    def wire_names(self, expressions: str):
+        """Returns the set of wire names referenced by comma-separated expressions."""
+        return set(
+            str(node.children[0])
+            for tree in self.parse_list(expressions)
+            for node in tree.find_data("wire")
+        )
+
 
 parser = ExpressionParser()  # initialize global parser object
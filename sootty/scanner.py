@@ -0,0 +1,172 @@
+from .exceptions import SoottyError, SoottyInternalError
+from .storage.logic import X, Z, Logic
+from .utils import EVCD_INPUT, EVCD_OUTPUT, EVCD_STATES, evcd_changes, vcdid_unhash
+
+CHUNK_SIZE = 1 << 18  # number of bytes split into tokens at a time
+
+# Values of scalar changes, keyed by the first byte of the token.
+SCALARS = {
+    ord("0"): 0,
+    ord("1"): 1,
+    ord("x"): X,
+    ord("X"): X,
+    ord("z"): Z,
+    ord("Z"): Z,
+}
+
+# Simulation keywords, whose value changes are read like any other.
+KEYWORDS = (b"$dumpvars", b"$dumpall", b"$dumpon", b"$dumpoff", b"$end")
+
+
+def find_definitions_end(buffer):
+    """Returns the offset just past the $enddefinitions command of a vcd buffer."""
+    index = buffer.find(b"$enddefinitions")
+    if index < 0:
+        raise SoottyError("Invalid vcd file: missing $enddefinitions.")
+    index = buffer.find(b"$end", index + len(b"$enddefinitions"))
+    if index < 0:
+        raise SoottyError("Invalid vcd file: $enddefinitions not followed by $end.")
+    return index + len(b"$end")
+
+
+def split_sections(buffer, start=0, end=None, count=1):
+    """
+    Returns the offsets of up to `count` sections of about equal size covering
+    a buffer from start to end, each beginning at a time marker (except the
+    first), so that they can be scanned independently.
+    """
+    end = len(buffer) if end is None else end
+    offsets = [start]
+    for section in range(1, count):
+        offset = buffer.find(b"\n#", start + (end - start) * section // count, end)
+        if offset < 0:
+            break
+        if offsets[-1] < offset + 1 < end:
+            offsets.append(offset + 1)
+    offsets.append(end)
+    return list(zip(offsets, offsets[1:]))
+
+
+def last_time(buffer, start=0, end=None):
+    """Returns the time of the last time marker between two offsets of a vcd buffer, or 0."""
+    index = buffer.rfind(b"\n#", max(start - 1, 0), len(buffer) if end is None else end)
+    if index < 0:
+        return 0
+    return int(buffer[index + 2 : index + 66].split(maxsplit=1)[0])
+
+
+def chunks(buffer, start=0, end=None, size=CHUNK_SIZE):
+    """Yields the tokens of a buffer, in lists covering about `size` bytes each."""
+    end = len(buffer) if end is None else end
+    while start < end:
+        stop = buffer.find(b"\n", min(start + size, end), end)
+        stop = end if stop < 0 else stop + 1
+        yield buffer[start:stop].split()
+        start = stop
+
+
+def scan(buffer, appenders, start=0, end=None, size=CHUNK_SIZE, time=0):
+    """
+    Parse the simulation section of a vcd file held in a bytes-like buffer.
+
+    Tokens are classified by their first byte and their values are passed
+    straight to `appenders`, a map from identifier code (as bytes) to a
+    function called with the time and value of each change. Changes to
+    identifier codes missing from the map are skipped. Changes before the
+    first time marker are at `time`. Returns the last time.
+    """
+    scalars = SCALARS
+    vector = None  # value of a vector change split from its identifier code
+    comment = False  # a $comment command continues into the next chunk
+    for tokens in chunks(buffer, start, end, size):
+        tokens = iter(tokens)
+        if comment:
+            comment = not skip_comment(tokens)
+        if vector is not None:
+            append_vector(appenders, time, vector, next(tokens, b""))
+            vector = None
+        for token in tokens:
+            head = token[0]
+            if head in scalars:
+                append = appenders.get(token[1:])
+                if append is not None:
+                    append(time, scalars[head])
+            elif head == 35:  # "#"
+                time = int(token[1:])
+            elif head == 98 or head == 66:  # "b" or "B"
+                ident = next(tokens, None)
+                if ident is None:
+                    vector = token[1:]
+                else:
+                    append_vector(appenders, time, token[1:], ident)
+            elif head == 36:  # "$"
+                if token == b"$comment":
+                    comment = not skip_comment(tokens)
+                elif token not in KEYWORDS:
+                    raise SoottyError(f"Invalid vcd token when parsing: {token}")
+            elif head == 114 or head == 82:  # "r" or "R"
+                raise SoottyInternalError(
+                    f"You forgot to implement token CHANGE_REAL."
+                )
+            elif head == 115 or head == 83:  # "s" or "S"
+                raise SoottyInternalError(
+                    f"You forgot to implement token CHANGE_STRING."
+                )
+            else:
+                raise SoottyError(f"Invalid vcd token when parsing: {token}")
+    return time
+
+
+def skip_comment(tokens):
+    """Consume tokens up to the $end of a comment, returns False if it was not found."""
+    for token in tokens:
+        if token == b"$end":
+            return True
+    return False
+
+
+def append_vector(appenders, time, vector, ident):
+    """Pass the value of a vector change to the appender of its identifier code."""
+    append = appenders.get(ident)
+    if append is not None:
+        try:
+            append(time, int(vector, 2))
+        except ValueError:  # vectors with x or z bits
+            append(time, Logic.from_str(vector.decode()))
+
+
+def scan_evcd(tokens, vcd_ids, appenders):
+    """
+    Parse the simulation section of an evcd token iterator, after its declarations
+    were converted by `evcd_definitions`. Port changes are translated into the
+    changes of the input and output wires of the port, which are passed to
+    `appenders` like `scan` does, without writing them out as vcd text.
+    Returns the last time.
+    """
+    time = 0
+    ports = dict()  # map from port hash to the appenders of its input and output
+    for change in evcd_changes(tokens, vcd_ids):
+        if type(change) is int:
+            time = change
+            continue
+        hash, value = change
+        port = ports.get(hash)
+        if port is None:
+            port = ports[hash] = (
+                appenders.get(vcdid_unhash(hash * 2)),
+                appenders.get(vcdid_unhash(hash * 2 + 1)),
+                vcd_ids[hash] == 1,
+            )
+        if value.translate(None, EVCD_STATES):  # deletes every valid state character
+            raise SoottyError("EVCD value error: value change is invalid")
+        for append, table in ((port[0], EVCD_INPUT), (port[1], EVCD_OUTPUT)):
+            if append is not None:
+                bits = value.translate(table)
+                if port[2]:  # scalar change
+                    append(time, SCALARS[bits[0]])
+                else:
+                    try:
+                        append(time, int(bits, 2))
+                    except ValueError:  # vectors with x or z bits
+                        append(time, Logic.from_str(bits.decode()))
+    return time
@@ -1,4 +1,8 @@
 from .valuechange import ValueChange
+from .arraychange import ArrayValueChange
+from .builder import ValueChangeBuilder
+from .intervalset import IntervalSet
+from .logic import Logic
 from .wire import Wire
 from .wiregroup import WireGroup
 from .wiretrace import WireTrace
@@ -0,0 +1,326 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import chain
+
+from ..exceptions import *
+from . import vectorized
+from .logic import Logic
+from .valuechange import BaseValueChange, ShiftedValueChange
+
+UNDEFINED = -1  # mask of a change to an undefined (None) value
+
+# Signed typecodes tried in order of size for the value and mask columns.
+TYPECODES = ("b", "h", "i", "q")
+
+# Minimum number of changes of the operands of an operator for it to be
+# evaluated with numpy, below which the python loops are faster.
+VECTORIZE_SIZE = 256
+
+
+class ArrayValueChange(BaseValueChange):
+    """
+    Columnar value change storage, backed by parallel typed arrays.
+
+    Times are stored as int64. Each value is split into a packed integer and
+    a mask of its x/z bits (a set mask bit is x if the value bit is set, z
+    otherwise), both stored in the smallest signed array type that fits the
+    wire width. A scalar change costs 10 bytes instead of a boxed key and value
+    in a sorted container. Columns are promoted to a wider type when a value
+    overflows, and to lists of python integers past 63 bits. The columns may
+    also be read-only memoryviews mapped from a trace cache, which are copied
+    into arrays on the first modification.
+    """
+
+    def __init__(self, width=1):
+        self.width = width
+        typecode = next(
+            (code for code in TYPECODES if width < 8 * array(code).itemsize), "q"
+        )
+        self._times = array("q")
+        self._values = array(typecode)
+        self._masks = array(typecode)
+
+    @classmethod
+    def from_changes(cls, width, times, values):
+        """Construct a ValueChange from sorted change times and their values, in one step."""
+        data = cls(width)
+        data._times = array("q", times)
+        try:
+            data._fill(values)
+        except TypeError:  # only encode the values that are not plain integers
+            values, masks = list(values), [0] * len(values)
+            for index, value in enumerate(values):
+                if type(value) is not int:
+                    values[index], masks[index] = data.encode(value)
+            data._fill(values, masks)
+        return data
+
+    @classmethod
+    def _from_arrays(cls, width, times, values, masks):
+        """Construct a ValueChange from numpy arrays of times, values and masks."""
+        data = cls(width)
+        data._times = array("q", times.tobytes())
+        index = TYPECODES.index(data._values.typecode)
+        if len(values):
+            low, high = int(values.min()), int(values.max())
+            while not -low <= 1 << 8 * array(TYPECODES[index]).itemsize - 1 > high:
+                index += 1
+        typecode = TYPECODES[index]
+        data._values = array(typecode, values.astype(typecode).tobytes())
+        data._masks = array(typecode, masks.astype(typecode).tobytes())
+        return data
+
+    def _fill(self, values, masks=None):
+        """Replace the value columns with sequences, promoting them until they fit."""
+        while not isinstance(self._values, list):
+            try:
+                self._values = array(self._values.typecode, values)
+                self._masks = array(
+                    self._values.typecode,
+                    bytes(len(values) * self._values.itemsize)
+                    if masks is None
+                    else masks,
+                )
+                return
+            except OverflowError:
+                self._promote()
+        if masks is None and not all(type(value) is int for value in values):
+            raise TypeError("Wire values must be encoded before filling lists.")
+        self._values = list(values)
+        self._masks = [0] * len(values) if masks is None else list(masks)
+
+    def encode(self, value):
+        """Split a wire value into a (value, mask) pair."""
+        if isinstance(value, int):
+            return value, 0
+        if value is None:
+            return 0, UNDEFINED
+        if isinstance(value, str):
+            value = Logic.from_str(value, self.width)
+            if isinstance(value, int):
+                return value, 0
+        return value.value, value.mask
+
+    def decode(self, value, mask):
+        """Join a (value, mask) pair into a wire value."""
+        if not mask:
+            return value
+        if mask == UNDEFINED:
+            return None
+        return Logic(value, mask, self.width)
+
+    def _thaw(self):
+        """Copy columns mapped from a cache file into arrays, before they are modified."""
+        if isinstance(self._times, memoryview):
+            self._times = array("q", self._times)
+        if isinstance(self._values, memoryview):
+            self._values = array(self._values.format, self._values)
+            self._masks = array(self._masks.format, self._masks)
+
+    def _promote(self):
+        """Convert the value columns to the next wider type."""
+        if isinstance(self._values, list):
+            return
+        index = TYPECODES.index(self._values.typecode) + 1
+        if index < len(TYPECODES):
+            self._values = array(TYPECODES[index], self._values)
+            self._masks = array(TYPECODES[index], self._masks)
+        else:
+            self._values = list(self._values)
+            self._masks = list(self._masks)
+
+    def _store(self, index, value, mask):
+        """Write an encoded value at an index, or append it if index is None."""
+        while True:
+            try:
+                return self._write(index, value, mask)
+            except OverflowError:
+                if len(self._values) > len(self._masks):
+                    self._values.pop()
+                self._promote()
+
+    def _write(self, index, value, mask):
+        if index is None:
+            self._values.append(value)
+            self._masks.append(mask)
+        else:
+            self._values[index] = value
+            self._masks[index] = mask
+
+    def _index(self, key):
+        """Returns the index of the change at the given time, or raises KeyError."""
+        index = bisect_left(self._times, key)
+        if index == len(self._times) or self._times[index] != key:
+            raise KeyError(key)
+        return index
+
+    def __len__(self):
+        return len(self._times)
+
+    def __iter__(self):
+        return iter(self._times)
+
+    def __contains__(self, key):
+        index = bisect_left(self._times, key)
+        return index < len(self._times) and self._times[index] == key
+
+    def __getitem__(self, key):
+        index = self._index(key)
+        return self.decode(self._values[index], self._masks[index])
+
+    def __setitem__(self, key, value):
+        self.version += 1
+        value, mask = self.encode(value)
+        if isinstance(self._times, memoryview):
+            self._thaw()
+        times = self._times
+        if not times or key > times[-1]:  # fast path for in-order changes
+            times.append(key)
+            self._store(None, value, mask)
+        elif key == times[-1]:
+            self._store(len(times) - 1, value, mask)
+        else:
+            index = bisect_left(times, key)
+            if times[index] == key:
+                self._store(index, value, mask)
+            else:
+                times.insert(index, key)
+                self._values.insert(index, 0)
+                self._masks.insert(index, 0)
+                self._store(index, value, mask)
+
+    def __delitem__(self, key):
+        self.version += 1
+        self._thaw()
+        index = self._index(key)
+        del self._times[index]
+        del self._values[index]
+        del self._masks[index]
+
+    def keys(self):
+        """Returns the sorted array of change times (must not be modified)."""
+        return self._times
+
+    def values(self):
+        """Returns an iterator over the decoded values, sorted by time."""
+        return map(self.decode, self._values, self._masks)
+
+    def items(self):
+        """Returns an iterator over (time, value) pairs, sorted by time."""
+        return zip(self._times, self.values())
+
+    def irange(self, minimum=None, maximum=None, reverse=False):
+        """Returns an iterator over the change times between minimum and maximum (inclusive)."""
+        times = self._times
+        low = 0 if minimum is None else bisect_left(times, minimum)
+        high = len(times) if maximum is None else bisect_right(times, maximum)
+        return reversed(times[low:high]) if reverse else iter(times[low:high])
+
+    def bisect_right(self, key):
+        """Returns the number of changes at or before a time, like SortedDict."""
+        return bisect_right(self._times, key)
+
+    def window(self, start=None, end=None):
+        """Returns an iterator over the changes in a window, see BaseValueChange."""
+        times = self._times
+        low = 0 if start is None else bisect_right(times, start)
+        high = len(times) if end is None else bisect_left(times, end)
+        changes = zip(
+            times[low:high],
+            map(self.decode, self._values[low:high], self._masks[low:high]),
+        )
+        value = None if start is None or low == 0 else self.get(start)
+        return changes if value is None else chain([(start, value)], changes)
+
+    def get(self, key):
+        index = bisect_right(self._times, key) - 1
+        if index < 0:
+            return None
+        return self.decode(self._values[index], self._masks[index])
+
+    def sweep(self, times):
+        """Yields the value at each of a non-decreasing sequence of times, see BaseValueChange."""
+        keys, values, masks, decode = self._times, self._values, self._masks, self.decode
+        index = None
+        value = None
+        for time in times:
+            if index is None:
+                index = bisect_right(keys, time)
+                if index:
+                    value = decode(values[index - 1], masks[index - 1])
+            elif index < len(keys) and keys[index] <= time:
+                while index < len(keys) and keys[index] <= time:
+                    index += 1
+                value = decode(values[index - 1], masks[index - 1])
+            yield value
+
+    def length(self):
+        """Returns the time duration of the wire."""
+        return self._times[-1] if self._times else 0
+
+    def nbytes(self):
+        """Returns an estimate of the memory used by the changes, in bytes."""
+        return sum(
+            len(column) * (40 if isinstance(column, list) else column.itemsize)
+            for column in (self._times, self._values, self._masks)
+        )
+
+    def _unary(self, op):
+        """Returns the result of a unary operator evaluated with numpy, or None."""
+        if not _vectorizable((self,)):
+            return None
+        result = vectorized.unary(self._values, self._masks, op, self.width)
+        if result is None:
+            return None
+        width = 1 if op == "bool" else self.width
+        return self._from_arrays(width, vectorized.numpy.asarray(self._times), *result)
+
+    def _to_bool(self):
+        data = self._unary("bool")
+        return super()._to_bool() if data is None else data
+
+    def __invert__(self):
+        data = self._unary("invert")
+        return super().__invert__() if data is None else data
+
+    def __neg__(self):
+        data = self._unary("neg")
+        return super().__neg__() if data is None else data
+
+    @classmethod
+    def _fold(cls, operands, op, width, xz_flag=0, logic=False):
+        if _vectorizable(operands):
+            result = vectorized.reduce(list(map(_columns, operands)), op, xz_flag)
+            if result is not None:
+                return cls._from_arrays(width, *result)
+        return super()._fold(operands, op, width, xz_flag, logic)
+
+
+def _vectorizable(operands):
+    """Returns whether numpy may be used to evaluate an operator on the operands."""
+    return (
+        vectorized.numpy is not None
+        and sum(map(len, operands)) >= VECTORIZE_SIZE
+        and all(
+            type(data) is ArrayValueChange and not isinstance(data._values, list)
+            for data in map(_parent, operands)
+        )
+    )
+
+
+def _parent(data):
+    """Returns the ValueChange that holds the changes of a ValueChange or view."""
+    return data._data if type(data) is ShiftedValueChange else data
+
+
+def _columns(data):
+    """Returns the (times, values, masks) columns of an ArrayValueChange or view."""
+    if type(data) is not ShiftedValueChange:
+        return data._times, data._values, data._masks
+    parent = data._data
+    # The columns start from the change at or before the floor of the view.
+    index = max(bisect_right(parent._times, data.floor + data.offset) - 1, 0)
+    times = vectorized.numpy.asarray(parent._times[index:]) - data.offset
+    if len(times):
+        times[0] = max(times[0], data.floor)
+    return times, parent._values[index:], parent._masks[index:]
@@ -0,0 +1,49 @@
+from array import array
+from itertools import islice
+from operator import eq
+
+from .arraychange import ArrayValueChange
+from .logic import Logic
+
+
+class ValueChangeBuilder:
+    """
+    Append-only buffer for the changes of a single wire while a trace is loaded.
+
+    Changes must be appended in non-decreasing time order, which vcd files
+    guarantee, so no ordering checks are made. When a time is repeated, the
+    last value appended for it wins.
+    """
+
+    def __init__(self, width=1):
+        self.width = width
+        self.times = array("q")
+        self.values = []
+
+    def append(self, time, value):
+        self.times.append(time)
+        self.values.append(value)
+
+    def extend(self, times, values):
+        """Append the changes buffered by another builder, e.g. for a later section of the file."""
+        self.times.extend(times)
+        self.values.extend(values)
+
+    def __len__(self):
+        return len(self.times)
+
+    def freeze(self, backend=ArrayValueChange):
+        """
+        Returns the buffered changes as a ValueChange object, built in one step.
+        Values with leading x or z bits are left-extended to the wire width.
+        """
+        times, values = self.times, self.values
+        if Logic in map(type, values):
+            values = [
+                value.extend(self.width) if type(value) is Logic else value
+                for value in values
+            ]
+        if any(map(eq, times, islice(times, 1, None))):
+            changes = dict(zip(times, values))  # keeps the last value of each time
+            times, values = list(changes.keys()), list(changes.values())
+        return backend.from_changes(self.width, times, values)
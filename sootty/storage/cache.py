@@ -0,0 +1,215 @@
+import hashlib
+import json
+import mmap
+import os
+import sys
+import tempfile
+from array import array
+
+from vcd.common import Timescale
+
+from .arraychange import ArrayValueChange
+from .wire import Wire
+from .wiregroup import WireGroup
+
+MAGIC = b"SOOTTY\x01\n"  # first bytes of a trace cache file, with its format version
+ALIGNMENT = 8  # columns are aligned so that they can be mapped as typed memoryviews
+SAMPLE_SIZE = 1 << 16  # number of bytes read from each sampled block of the trace file
+SAMPLES = 16  # number of blocks of the trace file hashed into its fingerprint
+
+
+def path(filename):
+    return filename + ".sootty"
+
+
+def fingerprint(filename):
+    """
+    Returns the size, mtime and a content hash of a wiretrace file. Only evenly
+    spaced blocks of the file (including its head and tail) are hashed, so
+    that very large files can be fingerprinted in constant time.
+
+    This is a trade-off: an edit that keeps both the size and the mtime of the
+    file, and only changes bytes outside of the sampled blocks, is not
+    detected, and the cache of the previous content is loaded.
+    """
+    with open(filename, "rb") as stream:
+        stat = os.fstat(stream.fileno())
+        digest = hashlib.blake2b(digest_size=16)
+        step = max(stat.st_size - SAMPLE_SIZE, 0) / max(SAMPLES - 1, 1)
+        for sample in range(SAMPLES):
+            stream.seek(int(sample * step))
+            digest.update(stream.read(SAMPLE_SIZE))
+    return {
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "hash": digest.hexdigest(),
+        "byteorder": sys.byteorder,
+    }
+
+
+def load(filename, fingerprint, names=None, backend=ArrayValueChange, mapped=False):
+    """
+    Loads the cached trace of a wiretrace file, if it matches the fingerprint.
+
+    :param names: if provided, only the wires with these names are loaded.
+    :param mapped: if true, the columns of the cache file are memory-mapped
+        instead of copied into memory (only with the ArrayValueChange backend).
+    :returns: the (root group, metadata) of the trace, or None.
+    """
+    try:
+        with open(path(filename), "rb") as stream:
+            if mapped:
+                buffer = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                buffer = stream.read()
+        if buffer[: len(MAGIC)] != MAGIC:
+            return None
+        start = len(MAGIC) + 16
+        length = int.from_bytes(buffer[len(MAGIC) : len(MAGIC) + 8], "little")
+        end = int.from_bytes(buffer[len(MAGIC) + 8 : start], "little")
+        if end != len(buffer):
+            return None  # cache file is truncated
+        header = json.loads(bytes(buffer[start : start + length]))
+        if header["fingerprint"] != fingerprint:
+            return None
+        buffer = memoryview(buffer)
+        wires = [
+            None
+            if not (names is None or entry["name"] in names)
+            else _load_wire(buffer, start + length, entry, backend, mapped)
+            for entry in header["wires"]
+        ]
+        metadata = header["metadata"]
+        if "timescale" in metadata:
+            metadata["timescale"] = Timescale.from_str(metadata["timescale"])
+        return _load_group(header["root"], wires), metadata
+    except (OSError, ValueError, KeyError, TypeError):
+        return None  # cache is missing, unreadable or from another version
+
+
+def save(filename, fingerprint, root, metadata):
+    """
+    Saves a loaded trace next to its wiretrace file. The cache is written to a
+    temporary file that replaces it, since other processes may have mapped it.
+    """
+    wires = dict()  # map from the id of each wire to its index in the cache
+    entries = []
+    columns = []
+    offset = 0
+    for wire in _walk(root):
+        if id(wire) in wires:
+            continue  # wire is aliased in several scopes
+        wires[id(wire)] = len(entries)
+        data = wire._data
+        if not isinstance(data, ArrayValueChange):
+            data = ArrayValueChange.from_changes(
+                data.width, list(data.keys()), list(data.values())
+            )
+        entry = {"name": wire.name, "width": data.width, "count": len(data)}
+        for column in (data._times, data._values, data._masks):
+            typecode, itemsize, blob = _dump_column(column)
+            entry.setdefault("columns", []).append((offset, typecode, itemsize))
+            columns.append(blob)
+            offset += len(blob) + -len(blob) % ALIGNMENT
+        entries.append(entry)
+    metadata = dict(metadata)
+    if "timescale" in metadata:
+        metadata["timescale"] = str(metadata["timescale"])
+    header = json.dumps(
+        {
+            "fingerprint": fingerprint,
+            "metadata": metadata,
+            "root": _dump_group(root, wires),
+            "wires": entries,
+        }
+    ).encode()
+    header += b" " * (-(len(MAGIC) + 16 + len(header)) % ALIGNMENT)
+    temporary = None
+    try:
+        descriptor, temporary = tempfile.mkstemp(
+            prefix=os.path.basename(path(filename)) + ".",
+            dir=os.path.dirname(os.path.abspath(filename)),
+        )
+        with open(descriptor, "wb") as stream:
+            stream.write(MAGIC)
+            stream.write(len(header).to_bytes(8, "little"))
+            end = len(MAGIC) + 16 + len(header) + offset
+            stream.write(end.to_bytes(8, "little"))
+            stream.write(header)
+            for blob in columns:
+                stream.write(blob)
+                stream.write(bytes(-len(blob) % ALIGNMENT))
+        os.replace(temporary, path(filename))
+    except OSError:
+        # The cache is only an optimization, e.g. for read-only directories.
+        if temporary is not None and os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def _walk(group):
+    """Yields the wires of a group and its subgroups."""
+    yield from group.wires
+    for subgroup in group.groups:
+        yield from _walk(subgroup)
+
+
+def _dump_group(group, wires):
+    return {
+        "name": group.name,
+        "wires": [wires[id(wire)] for wire in group.wires],
+        "groups": [_dump_group(subgroup, wires) for subgroup in group.groups],
+    }
+
+
+def _load_group(entry, wires):
+    group = WireGroup(entry["name"])
+    for index in entry["wires"]:
+        if wires[index] is not None:
+            group.add_wire(wires[index])
+    for subgroup in entry["groups"]:
+        group.add_group(_load_group(subgroup, wires))
+    return group
+
+
+def _dump_column(column):
+    """Returns the typecode, item size and bytes of a column."""
+    if not isinstance(column, list):
+        return column.typecode, column.itemsize, column.tobytes()
+    # Columns of python integers are stored as fixed size signed integers.
+    itemsize = max((value.bit_length() for value in column), default=0) // 8 + 1
+    return (
+        None,
+        itemsize,
+        b"".join(value.to_bytes(itemsize, "little", signed=True) for value in column),
+    )
+
+
+def _load_column(buffer, start, count, column, mapped):
+    offset, typecode, itemsize = column
+    offset += start
+    if typecode is None:
+        return [
+            int.from_bytes(buffer[index : index + itemsize], "little", signed=True)
+            for index in range(offset, offset + count * itemsize, itemsize)
+        ]
+    if array(typecode).itemsize != itemsize:
+        raise ValueError("Cached column was saved on another platform.")
+    view = buffer[offset : offset + count * itemsize]
+    if mapped:
+        return view.cast(typecode)
+    column = array(typecode)
+    column.frombytes(view)
+    return column
+
+
+def _load_wire(buffer, start, entry, backend, mapped):
+    data = ArrayValueChange(entry["width"])
+    data._times, data._values, data._masks = (
+        _load_column(buffer, start, entry["count"], column, mapped)
+        for column in entry["columns"]
+    )
+    if backend is not ArrayValueChange:
+        data = backend.from_changes(data.width, list(data.keys()), list(data.values()))
+    wire = Wire(name=entry["name"], width=entry["width"], backend=backend)
+    wire._data = data
+    return wire
@@ -0,0 +1,57 @@
+from collections import OrderedDict
+
+CACHE_SIZE = 1 << 28  # estimated bytes of computed wires kept by each trace
+
+
+def key(node):
+    """
+    Returns a hashable key of a parsed expression, made of the type and value
+    of each token, so that identical subexpressions have equal keys however
+    they were written.
+    """
+    if hasattr(node, "children"):
+        return (key(node.data),) + tuple(map(key, node.children))
+    return (getattr(node, "type", None), str(node))
+
+
+class ExpressionCache:
+    """
+    Least recently used cache of the wires computed from the expressions of a
+    trace, keyed by parsed expression. The cache is bounded by an estimate
+    of the memory used by the changes of its wires, in bytes.
+    """
+
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self.used = 0
+        self._wires = OrderedDict()  # map from key to (wire, size)
+
+    def get(self, key):
+        """Returns the wire computed for a key, or None."""
+        entry = self._wires.get(key)
+        if entry is None:
+            return None
+        self._wires.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, wire):
+        """Caches a computed wire, evicting the least recently used ones if needed."""
+        size = wire._data.nbytes()
+        if size > self.size:
+            return  # the wire would evict every other one
+        if key in self._wires:
+            self.used -= self._wires.pop(key)[1]
+        self._wires[key] = (wire, size)
+        self.used += size
+        while self.used > self.size:
+            self.used -= self._wires.popitem(last=False)[1][1]
+
+    def clear(self):
+        self._wires.clear()
+        self.used = 0
+
+    def __len__(self):
+        return len(self._wires)
+
+    def __contains__(self, key):
+        return key in self._wires
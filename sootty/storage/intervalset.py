@@ -0,0 +1,65 @@
+from bisect import bisect_right
+from itertools import chain
+
+
+class IntervalSet:
+    """
+    Set of integer times, stored as sorted and disjoint half-open intervals.
+
+    Iterating over the set yields each time it contains, so it can be used in
+    place of a sorted list of times. Its size and the cost of its operations
+    scale with the number of intervals rather than the number of times; use
+    `list()` to expand it explicitly.
+    """
+
+    def __init__(self, intervals=()):
+        """Construct a set from sorted (start, stop) pairs, merging touching intervals."""
+        self.starts = []
+        self.stops = []
+        for start, stop in intervals:
+            if stop <= start:
+                continue
+            if self.stops and start <= self.stops[-1]:
+                self.stops[-1] = max(self.stops[-1], stop)
+            else:
+                self.starts.append(start)
+                self.stops.append(stop)
+
+    @classmethod
+    def from_times(cls, times):
+        """Construct a set from a sorted iterable of times."""
+        return cls((time, time + 1) for time in times)
+
+    def intervals(self):
+        """Returns an iterator over the (start, stop) pairs of the set."""
+        return zip(self.starts, self.stops)
+
+    def first(self, after=None):
+        """Returns the first time in the set (greater than `after` if given), or None."""
+        if after is None:
+            return self.starts[0] if self.starts else None
+        index = bisect_right(self.stops, after + 1)
+        if index == len(self.starts):
+            return None
+        return max(self.starts[index], after + 1)
+
+    def __iter__(self):
+        return chain.from_iterable(map(range, self.starts, self.stops))
+
+    def __len__(self):
+        return sum(self.stops) - sum(self.starts)
+
+    def __bool__(self):
+        return bool(self.starts)
+
+    def __contains__(self, time):
+        index = bisect_right(self.starts, time) - 1
+        return index >= 0 and time < self.stops[index]
+
+    def __eq__(self, other):
+        if not isinstance(other, IntervalSet):
+            return NotImplemented
+        return self.starts == other.starts and self.stops == other.stops
+
+    def __repr__(self):
+        return "IntervalSet(%r)" % list(self.intervals())
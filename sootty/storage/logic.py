@@ -0,0 +1,116 @@
+from ..exceptions import SoottyError
+
+
+class Logic:
+    """
+    Immutable wire value with unknown (x) or high impedance (z) bits.
+
+    The value is packed into two integers, like the columns of
+    ArrayValueChange: a set bit of `mask` is x if the same bit of `value` is
+    set, and z otherwise. Fully known values are plain integers instead, so
+    that operators only fall back to the 4-state rules when an operand is a
+    Logic value. Bitwise operators follow the verilog rules (e.g. `0 & x` is
+    0), and z bits are read as x by every operator.
+    """
+
+    __slots__ = ("value", "mask", "width")
+
+    def __init__(self, value, mask, width=1):
+        self.value = value
+        self.mask = mask
+        self.width = max(width, mask.bit_length())
+
+    @classmethod
+    def from_str(cls, string, width=None):
+        """Parse a vcd bit string, left-extending leading x or z bits to the width."""
+        string = string.lower()
+        if width is not None and string[:1] in ("x", "z"):
+            string = string.rjust(width, string[0])
+        try:
+            value = int(string.replace("z", "0").replace("x", "1"), 2)
+            mask = int(string.replace("1", "0").replace("x", "1").replace("z", "1"), 2)
+        except ValueError:
+            raise SoottyError(f"Invalid wire value: '{string}'")
+        return cls(value, mask, len(string)) if mask else value
+
+    def extend(self, width):
+        """
+        Returns the value left-extended to a width, following the vcd rules for
+        vectors that start with an x or z bit.
+        """
+        if self.width >= width or not self.mask >> self.width - 1 & 1:
+            return self
+        return Logic.from_str(str(self), width)
+
+    @classmethod
+    def unknown(cls, width=1):
+        """Returns the value with all bits x (at least one)."""
+        width = max(width, 1)
+        full = (1 << width) - 1
+        return cls(full, full, width)
+
+    def __bool__(self):
+        """A value is true if any of its known bits is set."""
+        return bool(self.value & ~self.mask)
+
+    def __invert__(self):
+        full = (1 << self.width) - 1
+        return _join(~self.value & full | self.mask, self.mask, self.width)
+
+    def __and__(self, other):
+        value, mask, width = _split(other)
+        zeros = ~(self.value | self.mask) | ~(value | mask)  # known zero bits
+        mask = (self.mask | mask) & ~zeros
+        return _join(self.value & value | mask, mask, max(self.width, width))
+
+    def __or__(self, other):
+        value, mask, width = _split(other)
+        ones = self.value & ~self.mask | value & ~mask  # known one bits
+        mask = (self.mask | mask) & ~ones
+        return _join(self.value | value | mask, mask, max(self.width, width))
+
+    def __xor__(self, other):
+        value, mask, width = _split(other)
+        mask |= self.mask
+        return _join(self.value ^ value | mask, mask, max(self.width, width))
+
+    __rand__ = __and__
+    __ror__ = __or__
+    __rxor__ = __xor__
+
+    def __eq__(self, other):
+        if isinstance(other, Logic):  # leading zero bits do not matter
+            return self.value == other.value and self.mask == other.mask
+        if isinstance(other, str):
+            return str(self) == other.lower()
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((self.value, self.mask))
+
+    def __str__(self):
+        return "".join(
+            ("x" if self.value >> bit & 1 else "z")
+            if self.mask >> bit & 1
+            else ("1" if self.value >> bit & 1 else "0")
+            for bit in reversed(range(self.width))
+        )
+
+    def __repr__(self):
+        return "Logic(%r)" % str(self)
+
+
+X = Logic(1, 1)
+Z = Logic(0, 1)
+
+
+def _split(value):
+    """Returns the (value, mask, width) of an integer or Logic value."""
+    if isinstance(value, Logic):
+        return value.value, value.mask, value.width
+    return value, 0, value.bit_length()
+
+
+def _join(value, mask, width):
+    """Returns an integer if no bit is unknown, or a Logic value."""
+    return Logic(value, mask, width) if mask else value
@@ -0,0 +1,114 @@
+"""
+Cost-based planning of the chains of and/or operators of expressions.
+
+In a chain such as `valid & ready & (addr == const 4096)`, the result is
+fixed wherever one operand has a dominant value: 0 for `&` and `&&`, 1 for
+`|`, and any true value for `||`. The planner picks the wire operand that
+is dominant for most of the trace, relative to its number of changes, so
+that the other operands are only evaluated in the windows of time where it
+is not, and the result can still change.
+"""
+
+from .expressions import key
+from .valuechange import truth
+
+WINDOW_COST = 16  # estimated cost of evaluating an operand in a window, in changes
+
+# Whether a value of an operand is dominant in a chain, by operator token type.
+DOMINANT = {
+    "AND": lambda value: type(value) is int and value == 0,
+    "LAND": lambda value: type(value) is int and value == 0,
+    "OR": lambda value: type(value) is int and value == 1,
+    "LOR": lambda value: truth(value) == 1,
+}
+
+# Operators that read the whole history of their operand, from time 0.
+HISTORY = ("FROM", "AFTER", "UNTIL", "BEFORE", "ACC")
+
+
+def cost(trace, node):
+    """
+    Returns the estimated number of changes read to evaluate an expression, or
+    None if it reads the whole history of a wire in every window.
+    """
+    if node.data == "wire":
+        return len(trace.find(node.children[0])._data)
+    cached = trace._expressions.get(key(node))
+    if cached is not None:
+        return len(cached._data)
+    if node.data == "call":
+        children = node.children[1].children
+    elif node.data.type in HISTORY:
+        return None
+    elif node.data.type in ("NEXT", "PREV"):
+        children = [trace._shift(node)[1]]
+    elif node.data.type in ("CONST", "TIME"):
+        return 2
+    else:
+        children = node.children
+    total = 0
+    for child in children:
+        child = cost(trace, child)
+        if child is None:
+            return None
+        total += child
+    return total
+
+
+def statistics(trace, node, kind):
+    """
+    Returns the (changes, fraction, windows) statistics of a wire operand of a
+    chain: its number of changes, the fraction of the time of the trace that
+    its value is dominant, and the number of windows of time between. The
+    statistics of each wire are computed once per trace.
+    """
+    name = (key(node), kind)
+    if name not in trace._statistics:
+        data = trace.find(node.children[0])._data
+        length = max(trace.length(), 1)
+        dominant = DOMINANT[kind]
+        covered = 0  # time with a dominant value
+        windows = 1  # the time before the first change is a window
+        since = None  # time the value became dominant
+        for time, value in data.items():
+            if dominant(value):
+                if since is None:
+                    since = time
+            elif since is not None:
+                covered += min(time, length) - min(since, length)
+                windows += 1
+                since = None
+        if since is not None:
+            covered += max(length - since, 0)
+        trace._statistics[name] = (len(data), covered / length, windows)
+    return trace._statistics[name]
+
+
+def plan(trace, operands, kind):
+    """
+    Returns the index of the operand of a chain to evaluate first, to only
+    evaluate the others where it is not dominant, or None if evaluating all
+    the operands together is cheaper.
+    """
+    costs = [cost(trace, operand) for operand in operands]
+    if None in costs:
+        return None
+    total = sum(costs)
+    best = total
+    # Sparse wires are considered first, since the statistics of a wire cost
+    # a pass over its changes, which may be more than it could save.
+    wires = [pos for pos, operand in enumerate(operands) if operand.data == "wire"]
+    index = None
+    for position in sorted(wires, key=costs.__getitem__):
+        if 2 * costs[position] >= best:
+            break
+        changes, fraction, windows = statistics(trace, operands[position], kind)
+        others = total - changes
+        estimate = (
+            changes
+            + (1 - fraction) * others
+            + windows * (len(operands) - 1) * WINDOW_COST
+        )
+        if estimate < best:
+            best, index = estimate, position
+    return index
@@ -0,0 +1,327 @@
+from heapq import merge
+
+from ..exceptions import *
+from . import planner
+from .expressions import key
+from .intervalset import IntervalSet
+from .valuechange import combiner, invert, truth
+from .wire import Wire
+
+
+def compile(trace, node, start=None, end=None):
+    """
+    Compile a parsed expression on a trace into a stream of its changes.
+
+    Returns the width of the expression and an iterator over its (time, value)
+    changes, sorted by time. Each operator is a generator that only keeps a
+    small state, so the changes of the expression are computed in a single
+    pass over the changes of the wires it references, without building the
+    intermediate wires. Subexpressions already computed by the trace are
+    read from its expression cache instead.
+
+    If a window is given, the stream starts with the value at `start` and
+    stops before `end`. Only the changes of the referenced wires that can
+    affect the window are read, except for the temporal operators that depend
+    on the whole history of their operand (from, after, until, before and
+    acc), which are computed as wires in the expression cache of the trace.
+    """
+    if node.data == "wire":
+        wire = trace.find(node.children[0])
+        return wire.width(), _changes(wire._data, start, end)
+    cached = trace._expressions.get(key(node))
+    if cached is not None:
+        return cached.width(), _changes(cached._data, start, end)
+    if node.data == "call":
+        name = node.children[0]
+        args = [compile(trace, arg, start, end) for arg in node.children[1].children]
+        if name == "AXI":
+            return args[0]  # TODO: implement axi protocol
+        raise SoottyError(f'Function "{name}" does not exist.')
+    kind = node.data.type
+    if kind in ("NEG", "INV"):  # negation is evaluated as the inverse, like Wire
+        width, changes = compile(trace, node.children[0], start, end)
+        return width, ((time, invert(value, width)) for time, value in changes)
+    if kind == "LNOT":
+        width, changes = compile(trace, node.children[0], start, end)
+        return 1, ((time, invert(truth(value), 1)) for time, value in changes)
+    if kind in CHAINS:
+        nodes = trace._chain(node)
+        operands = [compile(trace, operand, start, end) for operand in nodes]
+        op, xz_flag, logical = CHAINS[kind]
+        width = 1 if logical else max(width for width, _ in operands)
+        combine = combiner(op, width, xz_flag, True)
+        index = None if kind == "XOR" else planner.plan(trace, nodes, kind)
+        if index is not None:
+            return width, _planned(trace, nodes, index, kind, combine, start, end)
+        streams = [_truth(changes) if logical else changes for _, changes in operands]
+        return width, _reduce(streams, combine)
+    if kind in BINOPS:
+        (left, first), (right, second) = (
+            compile(trace, operand, start, end) for operand in node.children
+        )
+        op, width = BINOPS[kind]
+        width = width(left, right)
+        return width, _reduce([first, second], combiner(op, width))
+    if kind == "NEXT" and start is None:
+        # The value at time 0 is the value of the operand `amount` later.
+        amount, operand = trace._shift(node)
+        width, changes = compile(trace, operand, None, _add(end, amount))
+        return width, _clip(_next(changes, amount), None, end)
+    if kind in ("NEXT", "PREV"):
+        # The changes of the operand are shifted, in a shifted window.
+        amount, operand = trace._shift(node)
+        shift = amount if kind == "NEXT" else -amount
+        if kind == "NEXT":
+            # Nothing is shifted before time 0: the value at time 0 is the value
+            # of the operand `amount` later, so the window starts there.
+            start = max(start, 0)
+        width, changes = compile(trace, operand, _add(start, shift), _add(end, shift))
+        return width, ((time - shift, value) for time, value in changes)
+    if kind in TEMPORAL:
+        # These operators read the whole history of their operand, so their
+        # wire is computed and cached by the trace, to be shared by the other
+        # expressions that use it (e.g. the limits and the breakpoints).
+        wire = trace._compute_wire(node)
+        return wire.width(), _changes(wire._data, start, end)
+    if kind == "CONST":
+        changes = [(0, int(node.children[0]))]
+        return 0, _clip(changes, start, end)
+    if kind == "TIME":
+        time = int(node.children[0])
+        changes = [(0, 0)] * (time > 0) + [(time, 1), (time + 1, 0)]
+        return 1, _clip(changes, start, end)
+    raise SoottyInternalError(f"Unable to compile expression node: {node.data}")
+
+
+def name(trace, node):
+    """Returns the name of the wire computed from a parsed expression by `WireTrace`."""
+    if node.data == "wire":
+        return trace.find(node.children[0]).name
+    if node.data == "call":
+        if node.children[0] == "AXI":
+            return name(trace, node.children[1].children[0])
+        raise SoottyError(f'Function "{node.children[0]}" does not exist.')
+    kind = node.data.type
+    if kind == "CONST":
+        return f"c_{node.children[0]}"
+    if kind == "TIME":
+        return f"t_{node.children[0]}"
+    if kind in ("NEXT", "PREV"):
+        amount, operand = trace._shift(node)
+        prefix = f"{node.data} " if amount == 1 else f"{amount} {node.data} "
+        return prefix + name(trace, operand)
+    if kind in TEMPORAL:
+        return f"{node.data} " + name(trace, node.children[0])
+    if len(node.children) == 1:
+        return f"{node.data}" + name(trace, node.children[0])
+    return Wire._chain_name(
+        f" {node.data} ", [name(trace, operand) for operand in trace._chain(node)]
+    )
+
+
+def intervals(changes, length=0, end=None):
+    """
+    Returns the IntervalSet of times with a high value, from the changes of an
+    expression, like `Wire.times`. If `end` is given, the changes are only read
+    up to the first one at or after it, and the times are cut before it.
+    """
+    result = []
+    first = None  # first time of the current interval
+    last = None  # time of the last change
+    for last, value in changes:
+        if end is not None and last >= end:
+            last = end - 1
+            break
+        if type(value) is int and value > 0:
+            if first is None:
+                first = last
+        elif first is not None:
+            result.append((first, last))
+            first = None
+    if first is not None:
+        stop = max(length, last + 1)
+        result.append((first, stop if end is None else min(stop, end)))
+    return IntervalSet(result)
+
+
+def first(changes, length=0, after=None):
+    """
+    Returns the first time (greater than `after` if given) in the intervals of
+    the changes of an expression, or None. Stops reading at the first match.
+    """
+    high = False  # whether the value at `after` is high
+    for time, value in changes:
+        if after is not None and time <= after:
+            high = type(value) is int and value > 0
+            continue
+        if high and time > after + 1:
+            return after + 1
+        high = False
+        if type(value) is int and value > 0:
+            return time
+    return after + 1 if high and after + 1 < length else None
+
+
+def _changes(data, start, end):
+    """Returns an iterator over the changes of a ValueChange, in a window if given."""
+    if start is None and end is None:
+        return iter(data.items())
+    return data.window(start, end)
+
+
+def _add(time, amount):
+    return None if time is None else time + amount
+
+
+def _clip(changes, start=None, end=None):
+    """
+    Yields the changes of a stream in a window, starting with its value at
+    `start` (if it is defined) and stopping before `end`.
+    """
+    value = None  # value at start
+    for time, change in changes:
+        if start is not None:
+            if time <= start:
+                value = change
+                continue
+            if value is not None:
+                yield start, value
+            start = None
+        if end is not None and time >= end:
+            return
+        yield time, change
+    if start is not None and value is not None:
+        yield start, value
+
+
+def _truth(changes):
+    for time, value in changes:
+        yield time, truth(value)
+
+
+def _tag(changes, index):
+    for time, value in changes:
+        yield time, index, value
+
+
+def _reduce(streams, combine, previous=None):
+    """
+    Yields the changes of the fold of several streams with a combine function,
+    that differ from the previous value.
+    """
+    values = [None] * len(streams)
+    current = None
+
+    def fold():
+        reduced = values[0]
+        for value in values[1:]:
+            reduced = combine(reduced, value)
+        return reduced
+
+    for time, index, value in merge(*map(_tag, streams, range(len(streams)))):
+        if time != current and current is not None:
+            reduced = fold()
+            if reduced != previous:
+                previous = reduced
+                yield current, reduced
+        current = time
+        values[index] = value
+    if current is not None:
+        reduced = fold()
+        if reduced != previous:
+            yield current, reduced
+
+
+def _planned(trace, nodes, index, kind, combine, start=None, end=None):
+    """
+    Yields the changes of a chain of operators, evaluating the operand at
+    `index` first and the others only in the windows of time where its value
+    is not dominant, see `planner`. The operands are folded in order.
+    """
+    dominant = planner.DOMINANT[kind]
+    result = 0 if kind in ("AND", "LAND") else 1  # value where `index` is dominant
+    logical = CHAINS[kind][2]
+    previous = None
+
+    def window(first, last, changes):
+        nonlocal previous
+        if first is not None and last is not None and first >= last:
+            return
+        streams = []
+        for position, operand in enumerate(nodes):
+            if position == index:
+                streams.append(iter(changes))
+                continue
+            stream = compile(trace, operand, first, last)[1]
+            streams.append(_truth(stream) if logical else stream)
+        for time, value in _reduce(streams, combine, previous):
+            previous = value
+            yield time, value
+
+    changes = compile(trace, nodes[index], start, end)[1]
+    buffer = []  # changes of the operand at `index` in the current window
+    live, since = True, start  # whether in a window, and its start
+    for time, value in _truth(changes) if logical else changes:
+        if not dominant(value):
+            if not live:
+                live, since, buffer = True, time, []
+            buffer.append((time, value))
+            continue
+        if live:
+            yield from window(since, time, buffer)
+            live = False
+        if previous != result:
+            previous = result
+            yield time, result
+    if live:
+        yield from window(since, end, buffer)
+
+
+def _next(changes, amt=1):
+    """Yields the changes of a stream shifted `amt` earlier, from time 0."""
+    changes = iter(changes)
+    value = None  # value at time amt
+    for time, change in changes:
+        if time < amt:
+            value = change
+            continue
+        if time > amt and value is not None:
+            yield 0, value
+        yield time - amt, change
+        break
+    else:
+        if value is not None:
+            yield 0, value
+        return
+    for time, change in changes:
+        yield time - amt, change
+
+
+# Binary operators by token type, with the width of their result.
+BINOPS = {
+    "EQ": ("eq", lambda left, right: 1),
+    "NEQ": ("ne", lambda left, right: 1),
+    "GT": ("gt", lambda left, right: 1),
+    "GEQ": ("ge", lambda left, right: 1),
+    "LT": ("lt", lambda left, right: 1),
+    "LEQ": ("le", lambda left, right: 1),
+    "SL": ("lshift", lambda left, right: left),
+    "SR": ("rshift", lambda left, right: left),
+    "ADD": ("add", lambda left, right: max(left, right) + 1),
+    "SUB": ("sub", lambda left, right: max(left, right) + 1),
+    "MOD": ("mod", lambda left, right: left),
+}
+
+# Chains of associative operators by token type, with their operator, xz flag
+# and whether their operands are logical values.
+CHAINS = {
+    "AND": ("and", 1, False),
+    "OR": ("or", 2, False),
+    "XOR": ("xor", 0, False),
+    "LAND": ("and", 1, True),
+    "LOR": ("or", 2, True),
+}
+
+# Temporal operators that read the whole history of their operand, by token
+# type, other than next and prev.
+TEMPORAL = ("FROM", "AFTER", "UNTIL", "BEFORE", "ACC")
@@ -0,0 +1,81 @@
+from bisect import bisect_left, bisect_right
+
+from .logic import Logic
+
+X = 1  # flag of a summary with unknown (or undefined) values
+Z = 2  # flag of a summary with high impedance values
+
+EMPTY = (None, None, 0)  # (low, high, flags) summary of no values
+
+
+class SummaryPyramid:
+    """
+    Multi-resolution summaries of the values of a ValueChange, to draw long
+    windows of time without reading every change.
+
+    Level 0 summarizes each change, and each level above summarizes pairs of
+    blocks of the level below, like a mipmap over the sequence of changes.
+    A summary is a (low, high, flags) tuple: the range of the known integer
+    values, and whether any value has x (or is undefined) or z bits. The
+    summary of a window of time is combined from O(log n) blocks, so its cost
+    does not depend on the length of the window.
+    """
+
+    def __init__(self, data):
+        times = data.keys()
+        self.times = times if hasattr(times, "__getitem__") else list(times)
+        self.version = data.version  # version of the changes the pyramid is built from
+        self.levels = [list(map(summarize, data.values()))]
+        while len(self.levels[-1]) > 1:
+            level = self.levels[-1]
+            self.levels.append(
+                [merge(*level[index : index + 2]) for index in range(0, len(level), 2)]
+            )
+
+    def stale(self, data):
+        """Returns whether a ValueChange changed since the pyramid was built from it."""
+        return data.version != self.version
+
+    def query(self, start, end):
+        """
+        Returns the (transitions, low, high, flags) summary of the values from
+        `start` to before `end`: the number of changes after `start`, and the
+        summary of the value at `start` and of these changes.
+        """
+        low = bisect_right(self.times, start)
+        high = bisect_left(self.times, end, low)
+        result = self.levels[0][low - 1] if low else summarize(None)
+        transitions = max(high - low, 0)
+        level = 0
+        while low < high:
+            if low & 1:
+                result = merge(result, self.levels[level][low])
+                low += 1
+            if high & 1:
+                high -= 1
+                result = merge(result, self.levels[level][high])
+            low >>= 1
+            high >>= 1
+            level += 1
+        return (transitions,) + result
+
+
+def summarize(value):
+    """Returns the (low, high, flags) summary of a single value."""
+    if type(value) is int:
+        return value, value, 0
+    if type(value) is Logic:
+        flags = (X if value.value & value.mask else 0) | (
+            Z if value.mask & ~value.value else 0
+        )
+        return None, None, flags
+    return None, None, X
+
+
+def merge(first, second=EMPTY):
+    """Returns the summary of the values of two summaries."""
+    low, high = first[0], first[1]
+    if second[0] is not None:
+        low = second[0] if low is None else min(low, second[0])
+        high = second[1] if high is None else max(high, second[1])
+    return low, high, first[2] | second[2]
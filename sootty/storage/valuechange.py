@@ -1,25 +1,54 @@
+from heapq import merge
+from itertools import chain, repeat
+
 from vcd.reader import *
-from itertools import islice
 from sortedcontainers import SortedDict, SortedList, SortedSet
 
 from ..exceptions import *
+from .intervalset import IntervalSet
+from .logic import X, Logic
+
+# Binary operators by name, applied to the values of two operands.
+BINOPS = {
+    "and": lambda x, y: x & y,
+    "or": lambda x, y: x | y,
+    "xor": lambda x, y: x ^ y,
+    "eq": lambda x, y: int(x == y),
+    "ne": lambda x, y: int(x != y),
+    "gt": lambda x, y: int(x > y),
+    "ge": lambda x, y: int(x >= y),
+    "lt": lambda x, y: int(x < y),
+    "le": lambda x, y: int(x <= y),
+    "lshift": lambda x, y: int(x << y),
+    "rshift": lambda x, y: int(x >> y),
+    "add": lambda x, y: x + y,
+    "sub": lambda x, y: x - y,
+    "mod": lambda x, y: x % y,
+}
+
+
+class BaseValueChange:
+    """
+    Operators shared by the value change storage backends.
+
+    Subclasses behave as a mapping from time to value, sorted by time, and
+    provide `irange`, `get` and `length`. Results are built with the same
+    backend as the left-hand operand.
+    """
+
+    version = 0  # number of modifications, to invalidate what is built from the changes
+
+    @classmethod
+    def from_changes(cls, width, times, values):
+        """Construct a ValueChange from sorted change times and their values."""
+        data = cls(width)
+        for key, value in zip(times, values):
+            data[key] = value
+        return data
 
-
-class ValueChange(SortedDict):
-    def __init__(self, width=1, *args, **kwargs):
-        super().__init__(self, *args, **kwargs)
-        self.width = width
-
-    def get(self, key):
-        if key in self:
-            return self[key]
-        if len(self) < 1 or key < next(self.irange()):
-            return None
-        return self[next(islice(self.irange(maximum=key, reverse=True), 1))]
-
-    def length(self):
-        """Returns the time duration of the wire."""
-        return next(self.irange(reverse=True)) if len(self) > 0 else 0
+    def _backend(self):
+        """Returns the class of the ValueChanges built by the operators."""
+        return type(self)
 
     def search(
         self,
@@ -27,178 +56,450 @@ class ValueChange(SortedDict):
         start=None,
         end=None,
     ):
-        """Returns a list of times that satisfy the function, between start and end times."""
-        indices = []
-        prev = None
-        for i in self.irange(minimum=start, maximum=end):
-            if prev is not None:
-                indices.extend(range(prev + 1, i))
-            if function(self[i]):
-                indices.append(i)
-                prev = i
-            else:
-                prev = None
-        if prev is not None and end is not None and end > prev:
-            indices.extend(range(prev + 1, end))
-        return indices
+        """Returns the IntervalSet of times that satisfy the function, between start and end times."""
+        intervals = []
+        first = None  # first time of the current interval
+        keys = list(self.irange(minimum=start, maximum=end))
+        for key, value in zip(keys, self.sweep(keys)):
+            if function(value):
+                if first is None:
+                    first = key
+            elif first is not None:
+                intervals.append((first, key))
+                first = None
+        if first is not None:
+            # The last interval lasts until the end time, or is a single time.
+            stop = keys[-1] + 1 if end is None else max(end, keys[-1] + 1)
+            intervals.append((first, stop))
+        return IntervalSet(intervals)
+
+    def sweep(self, times):
+        """
+        Yields the value at each of a non-decreasing sequence of times. Only the
+        first time is searched for, the changes are then walked forward, so
+        that each value costs amortized O(1).
+        """
+        times = iter(times)
+        time = next(times, None)
+        if time is None:
+            return
+        value = self.get(time)
+        keys = self.irange(minimum=time + 1)
+        key = next(keys, None)
+        while True:
+            while key is not None and key <= time:
+                value = self[key]
+                key = next(keys, None)
+            yield value
+            time = next(times, None)
+            if time is None:
+                return
+
+    def window(self, start=None, end=None):
+        """
+        Returns an iterator over the (time, value) changes in a window of time,
+        starting with the value at `start` if it is defined, and stopping
+        before `end`.
+        """
+        keys = self.irange(
+            minimum=None if start is None else start + 1,
+            maximum=None if end is None else end - 1,
+        )
+        changes = ((key, self[key]) for key in keys)
+        value = None if start is None else self.get(start)
+        return changes if value is None else chain([(start, value)], changes)
+
+    def nbytes(self):
+        """Returns an estimate of the memory used by the changes, in bytes."""
+        return 100 * len(self)  # boxed times and values in a sorted container
 
     def _to_bool(self):
-        data = ValueChange(width=1)
-        for key in self:
-            data[key] = None if self[key] == None else (int(bool(self[key])))
+        data = self._backend()(width=1)
+        for key, value in self.items():
+            data[key] = truth(value)
         return data
 
     def __invert__(self):
-        data = ValueChange(width=self.width)
-        for key in self:
-            data[key] = (
-                None if self[key] == None else (~self[key] & (2 << self.width - 1) - 1)
-            )
+        data = self._backend()(width=self.width)
+        for key, value in self.items():
+            data[key] = invert(value, self.width)
         return data
 
     def __neg__(self):
-        data = ValueChange(width=self.width)
-        for key in self:
-            data[key] = None if self[key] == None else (-self[key])
+        data = self._backend()(width=self.width)
+        for key, value in self.items():
+            data[key] = negate(value, self.width)
         return data
 
     def __not__(self):
         return not (self.width)
 
-    def _binop(self, other, binop, width, xz_flag=0):
-        data = ValueChange(width=width)
-        keys = SortedSet()
-        keys.update(self.keys())
-        keys.update(other.keys())
-        values = [None, None, None]
-        for key in keys:
-            reduced = None
-            if key in self:
-                values[0] = self[key]
-            if key in other:
-                values[1] = other[key]
-            if xz_flag == 1:
-                if values[0] == 0 or values[1] == 0:  # xz = 1 is logical and
-                    reduced = 0
-            if xz_flag == 2:  # xz = 2 is logical or
-                if values[0] == 1 or values[1] == 1:
-                    reduced = 1
-            if reduced is None:
-                reduced = (
-                    None
-                    if (
-                        (values[0] is None or values[1] is None)
-                        or (type(values[0]) == str)
-                        or (type(values[1]) == str)
-                    )
-                    else binop(values[0], values[1])
-                )
-            if reduced != values[2]:
-                values[2] = reduced
-                data[key] = reduced
-        return data
+    def _binop(self, other, op, width, xz_flag=0, logic=False):
+        """
+        Combine two ValueChanges with a binary operator. Operands with x or z
+        bits give an all x result, unless `logic` is set, for operators that
+        follow the 4-state rules of Logic values.
+        """
+        return self._reduce((other,), op, width, xz_flag, logic)
+
+    def _reduce(self, others, op, width, xz_flag=0, logic=False):
+        """
+        Fold ValueChanges into this one with a binary operator, from left to
+        right, like `_binop`. The changes of all operands are merged in a
+        single pass, without building the intermediate results.
+        """
+        operands = (self,) + tuple(others)
+        return self._backend()._fold(operands, op, width, xz_flag, logic)
+
+    @classmethod
+    def _fold(cls, operands, op, width, xz_flag=0, logic=False):
+        """Fold ValueChanges with a binary operator into a new one, see `_reduce`."""
+        combine = combiner(op, width, xz_flag, logic)
+        times, results = [], []
+        previous = None
+        for key, values in _merge(operands):
+            reduced = values[0]
+            for value in values[1:]:
+                reduced = combine(reduced, value)
+            if reduced != previous:
+                previous = reduced
+                times.append(key)
+                results.append(reduced)
+        return cls.from_changes(width, times, results)
 
     def __and__(self, other):
-        return self._binop(other, lambda x, y: x & y, max(self.width, other.width), 1)
+        return self._and(other)
 
     def __or__(self, other):
-        return self._binop(other, lambda x, y: x | y, max(self.width, other.width), 2)
+        return self._or(other)
 
     def __xor__(self, other):
-        return self._binop(other, lambda x, y: x ^ y, max(self.width, other.width))
+        return self._xor(other)
+
+    def _and(self, *others):
+        """Bitwise and of this ValueChange with any number of others."""
+        width = max(data.width for data in (self,) + others)
+        return self._reduce(others, "and", width, 1, True)
+
+    def _or(self, *others):
+        """Bitwise or of this ValueChange with any number of others."""
+        width = max(data.width for data in (self,) + others)
+        return self._reduce(others, "or", width, 2, True)
+
+    def _xor(self, *others):
+        """Bitwise xor of this ValueChange with any number of others."""
+        width = max(data.width for data in (self,) + others)
+        return self._reduce(others, "xor", width, 0, True)
 
     def __eq__(self, other):
-        return self._binop(other, lambda x, y: int(x == y), 1)
+        return self._binop(other, "eq", 1)
 
     def __ne__(self, other):
-        return self._binop(other, lambda x, y: int(x != y), 1)
+        return self._binop(other, "ne", 1)
 
     def __gt__(self, other):
-        return self._binop(other, lambda x, y: int(x > y), 1)
+        return self._binop(other, "gt", 1)
 
     def __ge__(self, other):
-        return self._binop(other, lambda x, y: int(x >= y), 1)
+        return self._binop(other, "ge", 1)
 
     def __lt__(self, other):
-        return self._binop(other, lambda x, y: int(x < y), 1)
+        return self._binop(other, "lt", 1)
 
     def __le__(self, other):
-        return self._binop(other, lambda x, y: int(x <= y), 1)
+        return self._binop(other, "le", 1)
 
     def __lshift__(self, other):
-        return self._binop(other, lambda x, y: int(x << y), self.width)
+        return self._binop(other, "lshift", self.width)
 
     def __rshift__(self, other):
-        return self._binop(other, lambda x, y: int(x >> y), self.width)
+        return self._binop(other, "rshift", self.width)
 
     def __add__(self, other):
-        return self._binop(other, lambda x, y: x + y, max(self.width, other.width) + 1)
+        return self._binop(other, "add", max(self.width, other.width) + 1)
 
     def __sub__(self, other):
-        return self._binop(other, lambda x, y: x - y, max(self.width, other.width) + 1)
+        return self._binop(other, "sub", max(self.width, other.width) + 1)
 
     def __mod__(self, other):
-        return self._binop(other, lambda x, y: x % y, self.width)
+        return self._binop(other, "mod", self.width)
 
     def _from(self):
-        data = ValueChange(width=1)
+        data = self._backend()(width=1)
         data[0] = 0
-        for key in self:
-            if self[key]:
+        for key, value in self.items():
+            if value:
                 data[key] = 1
                 break
         return data
 
     def _after(self):
-        data = ValueChange(width=1)
+        data = self._backend()(width=1)
         data[0] = 0
-        for key in self:
-            if self[key]:
+        for key, value in self.items():
+            if value:
                 data[key + 1] = 1
                 break
         return data
 
     def _until(self):
-        data = ValueChange(width=1)
+        data = self._backend()(width=1)
         data[0] = 1
-        for key in self:
-            if self[key]:
+        for key, value in self.items():
+            if value:
                 data[key + 1] = 0
                 break
         return data
 
     def _before(self):
-        data = ValueChange(width=1)
+        data = self._backend()(width=1)
         data[0] = 1
-        for key in self:
-            if self[key]:
+        for key, value in self.items():
+            if value:
                 data[key] = 0
                 break
         return data
 
     def _next(self, amt=1):
-        data = ValueChange(width=self.width)
-        data[0] = self.get(amt)
-        for key in self.irange(minimum=amt):
-            data[key - 1] = self[key]
-        return data
+        """Returns a view of the changes shifted `amt` earlier, without copying them."""
+        return ShiftedValueChange(self, amt, 0)
 
     def _prev(self, amt=1):
-        data = ValueChange(width=self.width)
-        for key in self:
-            data[key + 1] = self[key]
-        return data
+        """Returns a view of the changes shifted `amt` later, without copying them."""
+        return ShiftedValueChange(self, -amt, amt)
 
     def _acc(self):
-        data = ValueChange(width=0)
+        data = self._backend()(width=0)
         counter = 0
         data[0] = counter
         state = True
-        for key in self:
-            if self[key] and not state:
+        for key, value in self.items():
+            if value and not state:
                 state = True
                 counter += 1
                 data[key] = counter
-            elif not self[key] and state:
+            elif not value and state:
                 state = False
         return data
+
+
+def truth(value):
+    """Returns the truth value of a wire value: 1, 0, x if unknown or None."""
+    if value is None:
+        return None
+    if type(value) is Logic and not value:
+        return X  # no bit is known to be set
+    return int(bool(value))
+
+
+def resize(value, width):
+    """
+    Returns a wire value with the width of its wire, so that a Logic value is
+    printed with the same number of bits by every backend.
+    """
+    if type(value) is Logic and value.width != width:
+        return Logic(value.value, value.mask, width)
+    return value
+
+
+def invert(value, width):
+    """Returns the bitwise inverse of a wire value of a given width."""
+    return None if value == None else (~value & (2 << width - 1) - 1)
+
+
+def negate(value, width):
+    """Returns the negation of a wire value of a given width."""
+    if value is None:
+        return None
+    if type(value) is Logic:
+        return Logic.unknown(width)
+    return -value
+
+
+def combiner(op, width, xz_flag=0, logic=False):
+    """Returns the function that combines two wire values, see `_binop`."""
+    binop = BINOPS[op]
+
+    def combine(x, y):
+        if xz_flag == 1:
+            if x == 0 or y == 0:  # xz = 1 is logical and
+                return 0
+        if xz_flag == 2:  # xz = 2 is logical or
+            if x == 1 or y == 1:
+                return 1
+        if x is None or y is None:
+            return None
+        if logic or (type(x) is not Logic and type(y) is not Logic):
+            return binop(x, y)
+        return Logic.unknown(width)
+
+    return combine
+
+
+def _merge(changes):
+    """
+    Merges the sorted changes of several ValueChanges. Yields each change time
+    along with the list of the value of every ValueChange at that time (None
+    before its first change), which is updated in place.
+    """
+    values = [None] * len(changes)
+    current = None
+    for time, index, value in merge(
+        *(
+            zip(data.keys(), repeat(index), data.values())
+            for index, data in enumerate(changes)
+        )
+    ):
+        if time != current and current is not None:
+            yield current, values
+        current = time
+        values[index] = value
+    if current is not None:
+        yield current, values
+
+
+class ValueChange(BaseValueChange, SortedDict):
+    def __init__(self, width=1, *args, **kwargs):
+        super().__init__(self, *args, **kwargs)
+        self.width = width
+
+    @classmethod
+    def from_changes(cls, width, times, values):
+        """Construct a ValueChange from sorted change times and their values."""
+        data = cls(width)
+        data.update(zip(times, (resize(value, width) for value in values)))
+        return data
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, resize(value, self.width))
+        self.version += 1
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.version += 1
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.version += 1
+
+    def get(self, key):
+        index = self.bisect_right(key)
+        if index == 0:
+            return None
+        return self.peekitem(index - 1)[1]
+
+    def length(self):
+        """Returns the time duration of the wire."""
+        return next(self.irange(reverse=True)) if len(self) > 0 else 0
+
+
+class ShiftedValueChange(BaseValueChange):
+    """
+    Read-only view of the changes of a ValueChange shifted in time, built by
+    the next and prev operators without copying the changes.
+
+    The value of the view at a time is the value of the parent at that time
+    plus `offset`, from `floor` on, and undefined before. Views of views are
+    flattened onto the same parent, so that chained shifts cost O(1) to
+    build. Operators on a view build results with the backend of its parent.
+    """
+
+    def __init__(self, data, offset, floor):
+        if isinstance(data, ShiftedValueChange):
+            offset, floor = data.offset + offset, max(data.floor - offset, floor)
+            data = data._data
+        self._data = data
+        self.offset = offset
+        self.floor = floor
+        self.width = data.width
+
+    def _backend(self):
+        return self._data._backend()
+
+    def _start(self):
+        """Returns the time of the parent at the floor of the view."""
+        return self.floor + self.offset
+
+    def window(self, start=None, end=None):
+        """Returns an iterator over the changes in a window, see BaseValueChange."""
+        start = self.floor if start is None else max(start, self.floor)
+        changes = self._data.window(
+            start + self.offset, None if end is None else end + self.offset
+        )
+        return ((time - self.offset, value) for time, value in changes)
+
+    def items(self):
+        return self.window()
+
+    def keys(self):
+        return (time for time, _ in self.window())
+
+    def values(self):
+        return (value for _, value in self.window())
+
+    def irange(self, minimum=None, maximum=None, reverse=False):
+        """Returns an iterator over the change times between minimum and maximum."""
+        start = self._start()
+        low = start + 1 if minimum is None else max(start + 1, minimum + self.offset)
+        high = None if maximum is None else maximum + self.offset
+        keys = self._data.irange(minimum=low, maximum=high, reverse=reverse)
+        keys = (key - self.offset for key in keys)
+        if self._data.get(start) is None or not (
+            (minimum is None or minimum <= self.floor)
+            and (maximum is None or self.floor <= maximum)
+        ):
+            return keys
+        return chain(keys, [self.floor]) if reverse else chain([self.floor], keys)
+
+    def get(self, key):
+        return None if key < self.floor else self._data.get(key + self.offset)
+
+    def sweep(self, times):
+        """Yields the value at each of a non-decreasing sequence of times."""
+        times = iter(times)
+        for time in times:
+            if time >= self.floor:
+                times = chain([time], times)
+                yield from self._data.sweep(time + self.offset for time in times)
+                return
+            yield None
+
+    def length(self):
+        """Returns the time duration of the wire."""
+        start, last = self._start(), self._data.length()  # last change of the parent
+        if not len(self._data) or (last <= start and self._data.get(start) is None):
+            return 0
+        return max(last - self.offset, self.floor)
+
+    @property
+    def version(self):
+        return self._data.version
+
+    def nbytes(self):
+        """
+        Returns an estimate of the memory kept by the view: it owns no changes,
+        but keeps the changes of its parent alive.
+        """
+        return self._data.nbytes()
+
+    def __getitem__(self, key):
+        if key == self.floor and self._data.get(self._start()) is not None:
+            return self._data.get(self._start())
+        if key <= self.floor:
+            raise KeyError(key)
+        return self._data[key + self.offset]
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def __len__(self):
+        start = self._start()
+        skipped = self._data.bisect_right(start)
+        return len(self._data) - skipped + (self._data.get(start) is not None)
+
+    def __iter__(self):
+        return self.keys()
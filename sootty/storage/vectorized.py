@@ -0,0 +1,126 @@
+"""
+Operators on the columns of ArrayValueChange objects, vectorized with numpy.
+
+numpy is an optional dependency: if it is not installed, or if an operand
+holds x or z bits or values that may not fit in 64 bits, the functions
+return None and the operators loop over the changes in python instead.
+"""
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+LIMIT = 1 << 62  # bound on the operand values, so that sums fit in int64
+UNDEFINED = -1  # mask of an undefined (None) value, as in ArrayValueChange
+
+if numpy is not None:
+    # Binary operators by name, with the results of the python operators.
+    BINOPS = {
+        "and": numpy.bitwise_and,
+        "or": numpy.bitwise_or,
+        "xor": numpy.bitwise_xor,
+        "eq": numpy.equal,
+        "ne": numpy.not_equal,
+        "gt": numpy.greater,
+        "ge": numpy.greater_equal,
+        "lt": numpy.less,
+        "le": numpy.less_equal,
+        "add": numpy.add,
+        "sub": numpy.subtract,
+    }
+else:
+    BINOPS = dict()
+
+
+def _column(buffer):
+    """Returns an int64 numpy array with the contents of an array or memoryview."""
+    return numpy.asarray(buffer).astype(numpy.int64)
+
+
+def _operand(values, masks):
+    """
+    Returns the int64 values of a column and a boolean array of whether each
+    change is defined, or None if a change has x or z bits or a large value.
+    """
+    values, masks = _column(values), _column(masks)
+    defined = masks == 0
+    if not (defined | (masks == UNDEFINED)).all():
+        return None
+    if len(values) and not (-LIMIT < values.min() and values.max() < LIMIT):
+        return None
+    return values, defined
+
+
+def reduce(columns, op, xz_flag=0):
+    """
+    Fold the (times, values, masks) columns of several ValueChanges with a
+    binary operator, like `BaseValueChange._reduce`. The inputs are aligned
+    on the union of their change times with `searchsorted`, and repeated
+    results are dropped. Returns the (times, values, masks) arrays of the
+    result, or None if the operator is not vectorized for these operands.
+    """
+    if op not in BINOPS:
+        return None
+    operands = []
+    for times, values, masks in columns:
+        operand = _operand(values, masks)
+        if operand is None or not len(times):
+            return None
+        operands.append((_column(times), operand[0], operand[1]))
+    # The times of each operand are sorted runs, which a stable sort merges.
+    axis = numpy.sort(
+        numpy.concatenate([times for times, _, _ in operands]), kind="stable"
+    )
+    axis = axis[numpy.concatenate(([True], axis[1:] != axis[:-1]))]
+    reduced = defined = None
+    for times, values, valid in operands:
+        index = numpy.searchsorted(times, axis, side="right") - 1
+        known = (index >= 0) & valid[index]
+        values = values[index]
+        if reduced is None:
+            reduced, defined = values, known
+            continue
+        result = BINOPS[op](reduced, values).astype(numpy.int64)
+        dominant = None
+        if xz_flag == 1:  # xz = 1 is logical and
+            dominant = defined & (reduced == 0) | known & (values == 0)
+            result[dominant] = 0
+        elif xz_flag == 2:  # xz = 2 is logical or
+            dominant = defined & (reduced == 1) | known & (values == 1)
+            result[dominant] = 1
+        defined = defined & known
+        if dominant is not None:
+            defined |= dominant
+        reduced = result
+    reduced[~defined] = 0
+    # Only keep the changes to a different value.
+    keep = numpy.empty(len(axis), dtype=bool)
+    keep[:1] = defined[:1]
+    keep[1:] = (defined[1:] != defined[:-1]) | (reduced[1:] != reduced[:-1])
+    masks = numpy.where(defined, 0, UNDEFINED)
+    return axis[keep], reduced[keep], masks[keep]
+
+
+def unary(values, masks, op, width):
+    """
+    Apply a unary operator ("bool", "invert" or "neg") to each value of a
+    column, like the python operators. Returns the (values, masks) arrays of
+    the result, or None if the operator is not vectorized for the operand.
+    """
+    if numpy is None:
+        return None
+    operand = _operand(values, masks)
+    if operand is None:
+        return None
+    values, defined = operand
+    if op == "bool":
+        values = (values != 0).astype(numpy.int64)
+    elif op == "invert" and width < 63:
+        values = ~values & (2 << width - 1) - 1
+    elif op == "neg":
+        values = -values
+    else:
+        return None
+    values[~defined] = 0
+    return values, numpy.where(defined, 0, UNDEFINED)
@@ -1,13 +1,15 @@
 from itertools import compress, chain
 
 from ..exceptions import *
+from .summary import SummaryPyramid
 from .valuechange import ValueChange
 
 
 class Wire:
-    def __init__(self, name, width=1):
+    def __init__(self, name, width=1, backend=ValueChange):
         self.name = name
-        self._data = ValueChange(width)
+        self._data = backend(width)
+        self._summary = None  # summary pyramid of the changes, built when needed
 
     @classmethod
     def from_data(cls, name, data, width=1):
@@ -25,6 +27,19 @@ class Wire:
     def __getitem__(self, key):
         return self._data.get(key)
 
+    def sweep(self, times):
+        """Yields the value of the wire at each of a non-decreasing sequence of times."""
+        return self._data.sweep(times)
+
+    def summary(self, start, end):
+        """
+        Returns the (transitions, low, high, flags) summary of the values of the
+        wire from start to before end, see `SummaryPyramid`.
+        """
+        if self._summary is None or self._summary.stale(self._data):
+            self._summary = SummaryPyramid(self._data)
+        return self._summary.query(start, end)
+
     def __delitem__(self, key):
         del self._data[key]  # throws error if not present
 
@@ -68,18 +83,33 @@ class Wire:
         return wire
 
     def __and__(self, other):
-        wire = Wire(name="(" + self.name + " & " + other.name + ")")
-        wire._data = self._data.__and__(other._data)
-        return wire
+        return self._and(other)
 
     def __or__(self, other):
-        wire = Wire(name="(" + self.name + " | " + other.name + ")")
-        wire._data = self._data.__or__(other._data)
-        return wire
+        return self._or(other)
 
     def __xor__(self, other):
-        wire = Wire(name="(" + self.name + " ^ " + other.name + ")")
-        wire._data = self._data.__xor__(other._data)
+        return self._xor(other)
+
+    def _and(self, *others):
+        """Bitwise and of this wire with any number of others, in a single pass."""
+        names = [operand.name for operand in (self,) + others]
+        wire = Wire(name=Wire._chain_name(" & ", names))
+        wire._data = self._data._and(*(other._data for other in others))
+        return wire
+
+    def _or(self, *others):
+        """Bitwise or of this wire with any number of others, in a single pass."""
+        names = [operand.name for operand in (self,) + others]
+        wire = Wire(name=Wire._chain_name(" | ", names))
+        wire._data = self._data._or(*(other._data for other in others))
+        return wire
+
+    def _xor(self, *others):
+        """Bitwise xor of this wire with any number of others, in a single pass."""
+        names = [operand.name for operand in (self,) + others]
+        wire = Wire(name=Wire._chain_name(" ^ ", names))
+        wire._data = self._data._xor(*(other._data for other in others))
         return wire
 
     def _logical_not(self):
@@ -87,16 +117,30 @@ class Wire:
         wire._data = self._data._to_bool().__invert__()
         return wire
 
-    def _logical_and(self, other):
-        wire = Wire(name="(" + self.name + " && " + other.name + ")")
-        wire._data = self._data._to_bool().__and__(other._data._to_bool())
+    def _logical_and(self, *others):
+        names = [operand.name for operand in (self,) + others]
+        wire = Wire(name=Wire._chain_name(" && ", names))
+        wire._data = self._data._to_bool()._and(
+            *(other._data._to_bool() for other in others)
+        )
         return wire
 
-    def _logical_or(self, other):
-        wire = Wire(name="(" + self.name + " || " + other.name + ")")
-        wire._data = self._data._to_bool().__or__(other._data._to_bool())
+    def _logical_or(self, *others):
+        names = [operand.name for operand in (self,) + others]
+        wire = Wire(name=Wire._chain_name(" || ", names))
+        wire._data = self._data._to_bool()._or(
+            *(other._data._to_bool() for other in others)
+        )
         return wire
 
+    @staticmethod
+    def _chain_name(op, names):
+        """Returns the name of a chain of binary operations, grouped from the left."""
+        name = names[0]
+        for operand in names[1:]:
+            name = "(" + name + op + operand + ")"
+        return name
+
     def __eq__(self, other):
         wire = Wire(name="(" + self.name + " == " + other.name + ")")
         wire._data = self._data.__eq__(other._data)
@@ -173,12 +217,12 @@ class Wire:
         return wire
 
     def _next(self, amt=1):
-        wire = Wire(name="next " + self.name)
+        wire = Wire(name=("next " if amt == 1 else f"{amt} next ") + self.name)
         wire._data = self._data._next(amt)
         return wire
 
     def _prev(self, amt=1):
-        wire = Wire(name="prev " + self.name)
+        wire = Wire(name=("prev " if amt == 1 else f"{amt} prev ") + self.name)
         wire._data = self._data._prev(amt)
         return wire
 
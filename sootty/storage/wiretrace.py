@@ -1,21 +1,65 @@
+import mmap
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from io import BytesIO
 from vcd.reader import *
 
 from ..exceptions import *
+from ..index import TimeIndex
 from ..parser import parser
+from ..scanner import find_definitions_end, last_time, scan, scan_evcd, split_sections
+from .arraychange import ArrayValueChange
+from .builder import ValueChangeBuilder
+from .intervalset import IntervalSet
+from .logic import Logic
 from .wiregroup import WireGroup
 from .wire import Wire
-from ..utils import evcd2vcd
+from ..utils import evcd_definitions, evcd_tokens
+from . import cache as trace_cache
+from . import streaming
+from .expressions import ExpressionCache, key
+
+PARALLEL_SIZE = 1 << 24  # minimum number of bytes parsed by each worker process
 
 
 class WireTrace:
     def __init__(self):
         self.root = WireGroup("__root__")
+        self._resume = None  # (filename, offset, end, wires) to parse appended changes
+        self._expressions = ExpressionCache()  # wires computed from expressions
+        self._statistics = dict()  # statistics of the wires, see `planner`
 
     @classmethod
-    def from_vcd(cls, filename):
+    def from_vcd(
+        cls,
+        filename,
+        backend=ArrayValueChange,
+        names=None,
+        start=None,
+        end=None,
+        jobs=None,
+        cache=False,
+        cache_mmap=False,
+    ):
         """
-        Construct a WireTrace object from a parsed vcd file, using the pyvcd library.
+        Construct a WireTrace object from a parsed vcd file. The declarations are
+        parsed using the pyvcd library.
+
+        :param backend: ValueChange class used to store the changes of each wire.
+        :param names: if provided, only the wires with these names are loaded,
+            and the changes of all other wires are skipped.
+        :param start: if provided along with end, only the changes that cover
+            the window of time from start to end are loaded, using an index of
+            the file that is saved next to it. Ignored for evcd files.
+        :param jobs: if provided, the simulation section of large vcd and evcd files
+            is split at time markers and parsed by up to this many worker processes.
+        :param cache: if true, the trace is loaded from a binary snapshot saved
+            next to the file (FILENAME.sootty) when the size, mtime and content
+            hash of the file match, and the snapshot is saved after a full parse.
+        :param cache_mmap: if true, the columns of the snapshot are memory-mapped
+            instead of copied into memory.
 
         Syntax of 4-state VCD file (IEEE 1800-2017 §21.7.2):
 
@@ -77,78 +121,217 @@ class WireTrace:
         this = cls()
         this.metadata = dict()  # dictionary of vcd metadata
         wires = dict()  # map from id_code to wire object
+        builders = dict()  # map from id_code to buffered changes of the wire
         stack = [this.root]  # store stack of current group for scoping
 
-        with open(filename, "rb") as stream:
-            if filename.endswith(".evcd"):
-                stream = evcd2vcd(stream)
-
-            tokens = tokenize(stream)
-            for token in tokens:
-                if token.kind is TokenKind.COMMENT:
-                    this.metadata["comment"] = token.comment
-                elif token.kind is TokenKind.DATE:
-                    this.metadata["date"] = token.date
-                elif token.kind is TokenKind.ENDDEFINITIONS:
-                    break  # end of definitions
-                elif token.kind is TokenKind.SCOPE:
-                    group = WireGroup(token.scope.ident)
-                    stack[-1].add_group(group)
-                    stack.append(group)
-                elif token.kind is TokenKind.TIMESCALE:
-                    this.metadata["timescale"] = token.timescale
-                elif token.kind is TokenKind.UPSCOPE:
-                    if len(stack) == 0:
-                        raise SoottyError(f"Illegal end of scope.")
-                    stack.pop()
-                elif token.kind is TokenKind.VAR:
-                    if token.var.id_code in wires:
-                        stack[-1].add_wire(wires[token.var.id_code])
-                    else:
-                        wire = Wire(
-                            name=token.var.reference,
-                            width=token.var.size,
-                        )
-                        wires[token.var.id_code] = wire
-                        stack[-1].add_wire(wire)
-                elif token.kind is TokenKind.VERSION:
-                    this.metadata["version"] = token.version
+        if cache:
+            fingerprint = trace_cache.fingerprint(filename)
+            snapshot = trace_cache.load(
+                filename, fingerprint, names=names, backend=backend, mapped=cache_mmap
+            )
+            if snapshot is not None:
+                this.root, this.metadata = snapshot
+                return this
+
+        evcd = filename.endswith(".evcd")
+        if evcd:
+            # Only the declarations of evcd files are converted to vcd text, the
+            # port changes are passed to the wires while the file is streamed.
+            stream = open(filename, "rb")
+            tokens = evcd_tokens(stream)
+            ports = dict()  # map from port identifier hash to port size
+            buffer = evcd_definitions(tokens, ports)
+        else:
+            with open(filename, "rb") as stream:
+                if os.fstat(stream.fileno()).st_size > 0:
+                    buffer = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
                 else:
-                    raise SoottyError(f"Invalid vcd token when parsing: {token}")
-
-            time = None
-            for token in tokens:
-                if token.kind is TokenKind.CHANGE_TIME:
-                    time = token.time_change
-                elif token.kind is TokenKind.CHANGE_SCALAR:
-                    value = token.scalar_change.value
-                    value = int(value) if value in ("0", "1") else value
-                    wires[token.scalar_change.id_code][time] = value
-                elif token.kind is TokenKind.CHANGE_VECTOR:
-                    value = token.vector_change.value
-                    wires[token.vector_change.id_code][time] = value
-                elif token.kind is TokenKind.CHANGE_REAL:
-                    raise SoottyInternalError(
-                        f"You forgot to implement token CHANGE_REAL."
+                    buffer = bytes()
+
+        # The declarations are parsed by pyvcd, and the much larger simulation
+        # section by the builtin scanner.
+        definitions_end = find_definitions_end(buffer)
+        for token in tokenize(BytesIO(buffer[:definitions_end])):
+            if token.kind is TokenKind.COMMENT:
+                this.metadata["comment"] = token.comment
+            elif token.kind is TokenKind.DATE:
+                this.metadata["date"] = token.date
+            elif token.kind is TokenKind.ENDDEFINITIONS:
+                break  # end of definitions
+            elif token.kind is TokenKind.SCOPE:
+                group = WireGroup(token.scope.ident)
+                stack[-1].add_group(group)
+                stack.append(group)
+            elif token.kind is TokenKind.TIMESCALE:
+                this.metadata["timescale"] = token.timescale
+            elif token.kind is TokenKind.UPSCOPE:
+                if len(stack) == 0:
+                    raise SoottyError(f"Illegal end of scope.")
+                stack.pop()
+            elif token.kind is TokenKind.VAR and not (
+                names is None or token.var.reference in names
+            ):
+                pass  # wire is not needed
+            elif token.kind is TokenKind.VAR:
+                if token.var.id_code in wires:
+                    stack[-1].add_wire(wires[token.var.id_code])
+                else:
+                    wire = Wire(
+                        name=token.var.reference,
+                        width=token.var.size,
+                        backend=backend,
                     )
-                elif token.kind is TokenKind.CHANGE_STRING:
-                    raise SoottyInternalError(
-                        f"You forgot to implement token CHANGE_STRING."
+                    wires[token.var.id_code] = wire
+                    builders[token.var.id_code] = ValueChangeBuilder(
+                        width=token.var.size
                     )
-                elif token.kind is TokenKind.DUMPALL:
-                    pass  # not sure what to do here
-                elif token.kind is TokenKind.DUMPOFF:
-                    pass  # not sure what to do here
-                elif token.kind is TokenKind.DUMPON:
-                    pass  # not sure what to do here
-                elif token.kind is TokenKind.DUMPVARS:
-                    pass  # not sure what to do here
-                elif token.kind is TokenKind.END:
-                    pass  # not sure what to do here
-                else:
-                    raise SoottyError(f"Invalid vcd token when parsing: {token}")
+                    stack[-1].add_wire(wire)
+            elif token.kind is TokenKind.VERSION:
+                this.metadata["version"] = token.version
+            else:
+                raise SoottyError(f"Invalid vcd token when parsing: {token}")
+
+        appenders = {
+            id_code.encode(): builder.append for id_code, builder in builders.items()
+        }
+        if evcd:
+            size = os.fstat(stream.fileno()).st_size
+            count = min(jobs or 1, size // PARALLEL_SIZE)
+            if count > 1:
+                with mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    offset = find_definitions_end(mapped)
+                    sections = split_sections(mapped, offset, size, count)
+                cls._scan_sections(filename, sections, appenders, builders, ports)
+            else:
+                scan_evcd(tokens, ports, appenders)
+            stream.close()
+            complete = names is None
+        else:
+            tail = cls._scan_vcd(
+                filename, buffer, definitions_end, appenders, builders, start, end, jobs
+            )
+            if tail is not None:
+                this._resume = (
+                    filename,
+                    resume_offset(buffer, definitions_end, tail),
+                    tail,
+                    {id_code.encode(): wire for id_code, wire in wires.items()},
+                )
+            complete = tail is not None and names is None
+            if isinstance(buffer, mmap.mmap):
+                buffer.close()
+
+        for id_code, builder in builders.items():
+            wires[id_code]._data = builder.freeze(backend)
+
+        if cache and complete:
+            trace_cache.save(filename, fingerprint, this.root, this.metadata)
+
+        return this
+
+    @staticmethod
+    def _scan_vcd(
+        filename, buffer, definitions_end, appenders, builders, start, end, jobs
+    ):
+        """
+        Parse the simulation section of a vcd file into the builders of its wires,
+        see `from_vcd`. Returns the offset of the last line of the file if the
+        whole section was parsed, or None.
+        """
+        offset, stop = definitions_end, None
+        if start is not None and end is not None:
+            # Parse from the nearest indexed point, starting from the value of
+            # every wire at that point.
+            index = TimeIndex.open(filename, buffer, definitions_end)
+            offset, time, checkpoint = index.seek(start)
+            for id_code, value in checkpoint.items():
+                if id_code in appenders:
+                    appenders[id_code](time, value)
+            stop = index.offset_after(end)
 
-            return this
+        # The last line of the file is parsed separately, since it may not have
+        # been fully written yet if the file is being written by a simulation.
+        stop = len(buffer) if stop is None else stop
+        tail = stop
+        if stop == len(buffer):
+            tail = buffer.rfind(b"\n", offset, stop) + 1 or offset
+
+        count = min(jobs or 1, (tail - offset) // PARALLEL_SIZE)
+        if count > 1:
+            sections = split_sections(buffer, offset, tail, count)
+            WireTrace._scan_sections(filename, sections, appenders, builders)
+        else:
+            scan(buffer, appenders, start=offset, end=tail)
+
+        if tail < stop:
+            try:
+                scan(buffer, appenders, tail, stop, time=last_time(buffer, offset, tail))
+            except (SoottyError, ValueError):
+                pass  # incomplete line, whose time step is parsed again by refresh
+        return tail if offset == definitions_end and stop == len(buffer) else None
+
+    @staticmethod
+    def _scan_sections(filename, sections, appenders, builders, ports=None):
+        """
+        Parse sections of the simulation section of a vcd file (or of an evcd
+        file, given the sizes of its ports) into the builders of its wires, in
+        one worker process per section.
+        """
+        with ProcessPoolExecutor(max_workers=len(sections)) as executor:
+            results = executor.map(
+                _scan_section,
+                [filename] * len(sections),
+                *zip(*sections),
+                [list(appenders)] * len(sections),
+                [ports] * len(sections),
+            )
+            # Sections are stitched in order, a time repeated across a seam
+            # is resolved by freeze like any other repeated time.
+            for changes in results:
+                for id_code, (times, values) in changes.items():
+                    builders[id_code.decode()].extend(times, values)
+
+    def refresh(self):
+        """
+        Parse the changes appended to the vcd file since it was loaded or last
+        refreshed into the existing wires. Only complete lines are parsed.
+        Returns whether new changes were parsed.
+        """
+        if self._resume is None:
+            raise SoottyError(
+                "Only wiretraces parsed from a whole vcd file can be refreshed."
+            )
+        filename, offset, end, wires = self._resume
+        with open(filename, "rb") as stream:
+            size = os.fstat(stream.fileno()).st_size
+            if size < end:
+                raise SoottyError(f"File '{filename}' was truncated since it was loaded.")
+            if size == end:
+                return False
+            with mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                tail = buffer.rfind(b"\n", end) + 1
+                if tail <= end:
+                    return False  # no complete line was appended
+                # The last time step is parsed again from its marker. Its changes
+                # are removed first, since the last line may have been parsed
+                # while partly written, e.g. as the change of another wire.
+                time = last_time(buffer, offset, offset + 1)
+                for wire in wires.values():
+                    _truncate(wire._data, time)
+                appenders = {
+                    id_code: partial(_set_change, wire._data)
+                    for id_code, wire in wires.items()
+                }
+                scan(buffer, appenders, start=offset, end=tail, time=time)
+                self._expressions.clear()
+                self._statistics.clear()
+                self._resume = (
+                    filename,
+                    resume_offset(buffer, offset, tail),
+                    tail,
+                    wires,
+                )
+        return True
 
     @classmethod
     def from_pyrtl(cls, sim_trace):
@@ -185,10 +368,21 @@ class WireTrace:
         return self.root.get_names()
 
     def _compute_wire(self, node):
-        """Evaluate a limit expression"""
+        """
+        Evaluate a limit expression. Computed wires are cached by expression,
+        so that subexpressions shared by several expressions are computed once.
+        """
         if node.data == "wire":
             return self.find(node.children[0])
-        elif node.data == "call":
+        node_key = key(node)
+        wire = self._expressions.get(node_key)
+        if wire is None:
+            wire = self._compute_node(node)
+            self._expressions.put(node_key, wire)
+        return wire
+
+    def _compute_node(self, node):
+        if node.data == "call":
             name = node.children[0]
             args = list(map(self._compute_wire, node.children[1].children))
             if name == "AXI":
@@ -199,27 +393,17 @@ class WireTrace:
         elif node.data.type == "INV":
             return self._compute_wire(node.children[0]).__invert__()
         elif node.data.type == "AND":
-            return self._compute_wire(node.children[0]) & self._compute_wire(
-                node.children[1]
-            )
+            return Wire._and(*map(self._compute_wire, self._chain(node)))
         elif node.data.type == "OR":
-            return self._compute_wire(node.children[0]) | self._compute_wire(
-                node.children[1]
-            )
+            return Wire._or(*map(self._compute_wire, self._chain(node)))
         elif node.data.type == "XOR":
-            return self._compute_wire(node.children[0]) ^ self._compute_wire(
-                node.children[1]
-            )
+            return Wire._xor(*map(self._compute_wire, self._chain(node)))
         elif node.data.type == "LNOT":
             return self._compute_wire(node.children[0])._logical_not()
         elif node.data.type == "LAND":
-            return self._compute_wire(node.children[0])._logical_and(
-                self._compute_wire(node.children[1])
-            )
+            return Wire._logical_and(*map(self._compute_wire, self._chain(node)))
         elif node.data.type == "LOR":
-            return self._compute_wire(node.children[0])._logical_or(
-                self._compute_wire(node.children[1])
-            )
+            return Wire._logical_or(*map(self._compute_wire, self._chain(node)))
         elif node.data.type == "EQ":
             return self._compute_wire(node.children[0]) == self._compute_wire(
                 node.children[1]
@@ -273,9 +457,11 @@ class WireTrace:
         elif node.data.type == "BEFORE":
             return self._compute_wire(node.children[0])._before()
         elif node.data.type == "NEXT":
-            return self._compute_wire(node.children[0])._next()
+            amount, operand = self._shift(node)
+            return self._compute_wire(operand)._next(amount)
         elif node.data.type == "PREV":
-            return self._compute_wire(node.children[0])._prev()
+            amount, operand = self._shift(node)
+            return self._compute_wire(operand)._prev(amount)
         elif node.data.type == "ACC":
             return self._compute_wire(node.children[0])._acc()
         elif node.data.type == "CONST":
@@ -283,27 +469,107 @@ class WireTrace:
         elif node.data.type == "TIME":
             return Wire.time(int(node.children[0]))
 
-    def compute_wire(self, expr: str):
-        """Evaluate a limit expression to a wire."""
-        return self._compute_wire(parser.parse(expr))
+    @staticmethod
+    def _chain(node):
+        """
+        Returns the operands of a chain of the same associative operator, such
+        as `a & b & c`, from left to right, so that they are merged in one pass.
+        """
+        operands = []
+        kind = node.data.type
+        while getattr(node.data, "type", None) == kind:
+            operands.append(node.children[1])
+            node = node.children[0]
+        operands.append(node)
+        return operands[::-1]
 
-    def compute_wires(self, exprs: str):
+    @staticmethod
+    def _shift(node):
+        """Returns the amount and operand of a next or prev operator (`2 next a`)."""
+        if len(node.children) == 2:
+            return int(node.children[0]), node.children[1]
+        return 1, node.children[0]
+
+    def compute_wire(self, expr: str, start=None, end=None):
+        """
+        Evaluate a limit expression to a wire. If a window of time is given, only
+        the changes from `start` to before `end` are computed, from the changes
+        of the referenced wires that can affect them.
+        """
+        node = parser.parse(expr)
+        if start is None and end is None:
+            return self._compute_wire(node)
+        return self._window_wire(node, start, end)
+
+    def compute_wires(self, exprs: str, start=None, end=None):
         """Evaluate comma-separated limit expressions as a list of wires."""
-        return list(map(self._compute_wire, parser.parse_list(exprs)))
+        nodes = parser.parse_list(exprs)
+        if start is None and end is None:
+            return list(map(self._compute_wire, nodes))
+        return [self._window_wire(node, start, end) for node in nodes]
 
-    def evaluate(self, expr: str):
-        return self.compute_wire(expr).times(self.length())
+    def _window_wire(self, node, start, end):
+        """Returns the wire computed from an expression in a window, cached."""
+        window_key = ("window", key(node), start, end)
+        wire = self._expressions.get(window_key)
+        if wire is not None:
+            return wire
+        width, changes = streaming.compile(self, node, start, end)
+        times, values = [], []
+        for time, value in changes:
+            times.append(time)
+            values.append(value)
+        wire = Wire(name=streaming.name(self, node))
+        wire._data = ArrayValueChange.from_changes(width, times, values)
+        self._expressions.put(window_key, wire)
+        return wire
+
+    def stream(self, expr: str, start=None, end=None):
+        """
+        Returns an iterator over the (time, value) changes of an expression,
+        computed in a single pass without building intermediate wires. If a
+        window is given, the stream starts with the value at `start` and stops
+        before `end`.
+        """
+        return streaming.compile(self, parser.parse(expr), start, end)[1]
+
+    def evaluate(self, expr: str, start=None, end=None):
+        """
+        Returns the IntervalSet of times at which an expression is high, within
+        the window from `start` to before `end` if given.
+        """
+        if start is None and end is None:
+            return streaming.intervals(self.stream(expr), self.length())
+        # The stream starts one time early, so that the value at `start` is not
+        # taken for a change that extends the last interval past the trace, and
+        # is read up to the first change after the window, which ends it.
+        start = start or 0
+        changes = self.stream(expr, max(start - 1, 0))
+        times = streaming.intervals(changes, self.length(), end)
+        return IntervalSet(
+            (max(first, start), last) for first, last in times.intervals()
+        )
+
+    def first_time(self, expr: str, after=None):
+        """
+        Returns the first time (greater than `after` if given) at which an
+        expression is high, or None. The changes of the expression are computed
+        lazily, and stop being read at the first high value.
+        """
+        return streaming.first(self.stream(expr, after), self.length(), after)
 
     def compute_limits(self, start_expr: str, end_expr: str):
-        starts = self.evaluate(start_expr)
-        start = starts[0] if len(starts) > 0 else 0
-        ends = list(filter(lambda time: time > start, self.evaluate(end_expr)))
-        end = ends[0] if len(ends) else self.length()
+        start = self.first_time(start_expr)
+        start = start if start is not None else 0
+        end = self.first_time(end_expr, after=start)
+        end = end if end is not None else self.length()
         return (start, end)
-    
-    def print_breakpoints(self, breakpoints: list):
+
+    def print_breakpoints(self, breakpoints):
         """
         Print a table of wires and their values.
+
+        :param breakpoints: IntervalSet or sorted list of breakpoint times.
         """
         def rec_print(wires):
             for scope, sub in wires.items():
@@ -314,9 +580,51 @@ class WireTrace:
                     print("scope\t" + scope)
                     for wire in sub:
                         print(wire.name, end="\t")
-                        for breakpoint in breakpoints:
-                            print(str(wire._data.get(breakpoint)), end="\t")
+                        for value in wire.sweep(breakpoints):
+                            print(str(value), end="\t")
                         print()
         
         print("time", *breakpoints, sep="\t")
         rec_print(self.root.get_wires())
+
+
+def _scan_section(filename, start, end, idents, ports=None):
+    """
+    Parse a section of the simulation section of a vcd file in a worker process,
+    or of an evcd file if the sizes of its ports are given.
+
+    :returns: map from identifier code to the (times, values) of its changes.
+    """
+    builders = {ident: ValueChangeBuilder() for ident in idents}
+    appenders = {ident: builder.append for ident, builder in builders.items()}
+    with open(filename, "rb") as stream:
+        with mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            if ports is None:
+                scan(buffer, appenders, start=start, end=end)
+            else:
+                scan_evcd(evcd_tokens(BytesIO(buffer[start:end])), ports, appenders)
+    return {
+        ident: (builder.times, builder.values)
+        for ident, builder in builders.items()
+        if len(builder)
+    }
+
+
+def _set_change(data, time, value):
+    """Set a parsed change, left-extending values with leading x or z bits."""
+    data[time] = value.extend(data.width) if type(value) is Logic else value
+
+
+def _truncate(data, time):
+    """Remove the changes of a ValueChange from a time on."""
+    for key in list(data.irange(minimum=time)):
+        del data[key]
+
+
+def resume_offset(buffer, start, end):
+    """
+    Returns the offset to resume parsing a growing vcd file from, after it was
+    parsed up to `end`: the last time marker, so that the changes of the last
+    time step are parsed again and a partly written step is completed.
+    """
+    return buffer.rfind(b"\n#", start, end) + 1 or start
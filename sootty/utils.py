@@ -1,8 +1,15 @@
 from math import ceil, log
-from io import BytesIO, BufferedReader
+from io import BytesIO, BufferedReader, RawIOBase
 
 from .exceptions import SoottyError
 
+READ_SIZE = 1 << 18  # number of bytes read from an evcd stream at a time
+
+# Translation tables from EVCD port states to VCD values, by port direction.
+EVCD_STATES = b"DUNZduLHXTlh01?FAaBbCcf"
+EVCD_INPUT = bytes.maketrans(EVCD_STATES, b"01xz01zzzzzz01xz0011xxz")
+EVCD_OUTPUT = bytes.maketrans(EVCD_STATES, b"zzzzzz01xz0101xz1x0x01z")
+
 
 def dec2anybase(input, base, width):
     """
@@ -54,20 +61,9 @@ def evcd_strcpy(src, direction):
     """
     Convert EVCD value changes into VCD input/output value changes according to direction.
     """
-    evcd = b"DUNZduLHXTlh01?FAaBbCcf"
-    vcdi = b"01xz01zzzzzz01xz0011xxz"  # input direction = False
-    vcdo = b"zzzzzz01xz0101xz1x0x01z"  # output direction = True
-    vcd = vcdo if direction else vcdi
-    value = bytes()
-    for vc_bit in src:
-        for i in range(23):
-            if evcd[i] == vc_bit:
-                value += vcd[i : i + 1]
-                i -= 1  # choice of i can be alternative
-                break
-        if i == 22:
-            raise SoottyError("EVCD value error: value change is invalid")
-    return value
+    if src.translate(None, EVCD_STATES):  # deletes every valid state character
+        raise SoottyError("EVCD value error: value change is invalid")
+    return src.translate(EVCD_OUTPUT if direction else EVCD_INPUT)
 
 
 def evcd2vcd(stream):
@@ -124,11 +120,64 @@ def evcd2vcd(stream):
          $dumpports (scope_identifier , string_literal | variable | expression )
     """
 
-    buf = stream.read()
-    toks = buf.split()  # compared with re.split(b'\s+', buf), this automatically strip
-    tokit = iter(toks)
-    vcd = BytesIO()
+    return BufferedReader(IteratorReader(evcd2vcd_chunks(stream)))
+
+
+def evcd2vcd_chunks(stream):
+    """Yields the VCD text converted from an EVCD input stream, in chunks of bounded size."""
+    tokit = evcd_tokens(stream)
     vcd_ids = dict()
+    yield evcd_definitions(tokit, vcd_ids)
+    vcd = BytesIO()
+    for change in evcd_changes(tokit, vcd_ids):
+        if type(change) is int:  # simulation time
+            vcd.write(b"#%d\n" % change)
+            continue
+        if vcd.tell() >= READ_SIZE:
+            yield vcd.getvalue()
+            vcd = BytesIO()
+        hash, value_change = change
+        if vcd_ids[hash] == 1:  # scalar change
+            vcd.write(
+                b"%s%s\n" % (evcd_strcpy(value_change, False), vcdid_unhash(hash * 2))
+            )
+            vcd.write(
+                b"%s%s\n"
+                % (evcd_strcpy(value_change, True), vcdid_unhash(hash * 2 + 1))
+            )
+        else:  # node > 1, vector change
+            vcd.write(
+                b"b%s %s\n" % (evcd_strcpy(value_change, False), vcdid_unhash(hash * 2))
+            )
+            vcd.write(
+                b"b%s %s\n"
+                % (evcd_strcpy(value_change, True), vcdid_unhash(hash * 2 + 1))
+            )
+    yield vcd.getvalue()
+
+
+def evcd_tokens(stream, size=READ_SIZE):
+    """Yields the whitespace-separated tokens of a stream, reading `size` bytes at a time."""
+    rest = b""  # token split across two reads
+    while True:
+        block = stream.read(size)
+        if not block:
+            break
+        tokens = (rest + block).split()
+        rest = b"" if block[-1:].isspace() or not tokens else tokens.pop()
+        yield from tokens
+    if rest:
+        yield rest
+
+
+def evcd_definitions(tokit, vcd_ids):
+    """
+    Converts the declarations of an EVCD token iterator into VCD declarations,
+    consuming tokens up to $enddefinitions. Each port is split into an input
+    and an output wire, and its size is stored in `vcd_ids` under the hash of
+    its identifier code. Returns the VCD text.
+    """
+    vcd = BytesIO()
     try:
         scope_layer = 0
         tok = next(tokit)
@@ -281,43 +330,35 @@ def evcd2vcd(stream):
                     )
             else:
                 raise SoottyError("EVCD syntax error: invalid keyword")
+    except StopIteration:
+        pass
+    return vcd.getvalue()
+
+
+def evcd_changes(tokit, vcd_ids):
+    """
+    Yields the simulation section of an EVCD token iterator, following its
+    declarations, as simulation times (int) and port value changes, given as
+    (hash of the identifier code, port value) pairs.
+    """
+    hashes = dict()  # map from identifier code to its hash
+    try:
         sim_kw = False
         while True:
             tok = next(tokit)
             if tok.startswith(b"#"):
-                vcd.write(tok + b"\n")
+                yield int(tok[1:])
             elif tok.startswith(b"p"):
                 value_change = tok[1:]
                 next(tokit)  # 0_strength_component
                 next(tokit)  # 1_strength_component
                 id_code = next(tokit)
-                hash = vcdid_hash(id_code)
+                hash = hashes.get(id_code)
+                if hash is None:
+                    hash = hashes[id_code] = vcdid_hash(id_code)
                 node = vcd_ids.get(hash)
                 if node is not None:
-                    if node == 1:  # scalar change
-                        vcd.write(
-                            b"%s%s\n"
-                            % (evcd_strcpy(value_change, False), vcdid_unhash(hash * 2))
-                        )
-                        vcd.write(
-                            b"%s%s\n"
-                            % (
-                                evcd_strcpy(value_change, True),
-                                vcdid_unhash(hash * 2 + 1),
-                            )
-                        )
-                    else:  # node > 1, vector change
-                        vcd.write(
-                            b"b%s %s\n"
-                            % (evcd_strcpy(value_change, False), vcdid_unhash(hash * 2))
-                        )
-                        vcd.write(
-                            b"b%s %s\n"
-                            % (
-                                evcd_strcpy(value_change, True),
-                                vcdid_unhash(hash * 2 + 1),
-                            )
-                        )
+                    yield hash, value_change
                 else:
                     raise SoottyError("EVCD syntax error: undeclared identifier_code")
             # Ignores simulation keywords not in comments
@@ -358,5 +399,25 @@ def evcd2vcd(stream):
                 )
     except StopIteration:
         pass
-    vcd.seek(0)
-    return BufferedReader(vcd)
+
+
+class IteratorReader(RawIOBase):
+    """Read-only binary stream over an iterator of bytes chunks."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._chunk = memoryview(b"")
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._chunk:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0  # end of stream
+            self._chunk = memoryview(chunk)
+        size = min(len(buffer), len(self._chunk))
+        buffer[:size] = self._chunk[:size]
+        self._chunk = self._chunk[size:]
+        return size
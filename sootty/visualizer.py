@@ -3,6 +3,7 @@ from enum import Enum
 
 from .display import VectorImage
 from .exceptions import SoottyInternalError
+from .storage import IntervalSet, Logic, summary
 from .utils import dec2anybase
 
 
@@ -21,6 +22,7 @@ class Style:
         TRANS_START = 5
         TRANS_WIDTH = 5
         BLOCK_TRANS = False
+        SUMMARY_UNITS = 2  # time units per pixel from which wires are summarized
         LINE_COLOR = "#FFFFFF"  # line color now needs to be its own class (?) depending on wires and variables
         LINE_COLOR_HIGH = "#00FF00"
         LINE_COLOR_LOW = "#3DB8B8"
@@ -66,6 +68,24 @@ class Style:
 class Visualizer:
     """Converter for wiretrace objects to a svg vector image format."""
 
+    _templates = {}  # templates of the transitions by style and transition
+
+    # Names of the coordinates of the shapes of a transition, see `_coordinates`.
+    COORDINATES = (
+        "left",
+        "right",
+        "top",
+        "bottom",
+        "middle",
+        "trans",
+        "block",
+        "data",
+        "text_x",
+        "text_y",
+        "run",
+        "value",
+    )
+
     def __init__(self, style=Style.Default):
         """Optionally pass in a style class to control how the visualizer looks."""
         self.style = style
@@ -92,13 +112,24 @@ class Visualizer:
                 None
                 if len(wires) == 0
                 else set(
-                    map(lambda wire: wire.name, wiretrace.compute_wires(wires.strip()))
+                    map(
+                        lambda wire: wire.name,
+                        wiretrace.compute_wires(
+                            wires.strip(), max(start - 1, 0), start + length
+                        ),
+                    )
                 )
             )
 
+        # The image is rendered lazily, as it is written.
         return VectorImage(
-            self._wiretrace_to_svg(
-                wiretrace, start, length, wires, breakpoints, vector_radix
+            lambda: self._wiretrace_to_svg(
+                wiretrace,
+                start,
+                length,
+                None if wires is None else set(wires),
+                breakpoints,
+                vector_radix,
             )
         )
 
@@ -116,21 +147,23 @@ class Visualizer:
             * (1 + (len(wires) if wires else wiretrace.num_wires()))
         )
 
-        svg = (
+        yield (
             f'<svg viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg">'
             f'<rect x="0" y="0" width="{width}" height="{height}" fill="{self.style.BKGD_COLOR}" />'
         )
 
-        svg += self._timestamps_to_svg(
+        yield from self._timestamps_to_svg(
             left=self.style.LEFT_MARGIN + self.style.TEXT_WIDTH,
             top=self.style.TOP_MARGIN,
             start=start,
             length=length,
         )
 
-        if not breakpoints:
-            breakpoints = []
-        svg += self._breakpoints_to_svg(
+        if breakpoints is None:
+            breakpoints = IntervalSet()
+        elif not isinstance(breakpoints, IntervalSet):
+            breakpoints = IntervalSet.from_times(breakpoints)
+        yield from self._breakpoints_to_svg(
             breakpoints,
             left=self.style.LEFT_MARGIN + self.style.TEXT_WIDTH,
             top=self.style.TOP_MARGIN,
@@ -140,7 +173,7 @@ class Visualizer:
         )
 
         # Add the root wiregroup to the image.
-        result = self._wiregroup_to_svg(
+        index = yield from self._wiregroup_to_svg(
             wiregroup=wiretrace.root,
             left=self.style.LEFT_MARGIN,
             top=self.style.TOP_MARGIN + self.style.WIRE_HEIGHT + self.style.WIRE_MARGIN,
@@ -149,14 +182,12 @@ class Visualizer:
             wires=wires,
             vector_radix=vector_radix,
         )
-        svg += result[0]
-        index = result[1]
 
         # Add each composite wire to the image.
         if wires is not None:
             for wire in wires:
-                svg += self._wire_to_svg(
-                    wiretrace.compute_wire(wire),
+                yield from self._wire_to_svg(
+                    wiretrace.compute_wire(wire, max(start - 1, 0), start + length),
                     left=self.style.LEFT_MARGIN,
                     top=self.style.TOP_MARGIN
                     + self.style.WIRE_HEIGHT
@@ -168,13 +199,11 @@ class Visualizer:
                 index += 1
             wires.clear()  # TODO: fix temporary solution for catching exceptions
 
-        svg += "</svg>"
-        return svg
+        yield "</svg>"
 
     def _timestamps_to_svg(self, left, top, start, length):
-        svg = ""
         for index in range(start, start + length, ((length - 1) // 32) + 1):
-            svg += self._shape_to_svg(
+            yield self._shape_to_svg(
                 {
                     "name": "text",
                     "x": left
@@ -187,38 +216,90 @@ class Visualizer:
                     "content": index,
                 }
             )
-        return svg
 
     def _breakpoints_to_svg(self, breakpoints, left, top, start, length, height):
-        """Convert a list of breakpoint times to highlights on the svg."""
-        svg = ""
-        for i, index in enumerate(breakpoints):
-            if index >= start and index < start + length:
-                svg += self._shape_to_svg(
+        """
+        Convert an IntervalSet of breakpoint times to highlights on the svg, with
+        one rect per interval in the window. The colors of the style cycle over
+        the breakpoint times, with a pattern of one time unit per color.
+        """
+        colors = self.style.BREAKPOINT_COLOR_LIST
+        unit = self.style.FULL_WIDTH / length
+        phases = set()  # phases of the color patterns defined so far
+        count = 0  # number of breakpoints before the current interval
+        for first, last in breakpoints.intervals():
+            if first >= start + length:
+                break
+            low, high = max(first, start), min(last, start + length)
+            if low < high:
+                # The color of the time `start` (which may not be a breakpoint).
+                phase = (count + start - first) % len(colors)
+                fill = colors[phase]
+                if len(colors) > 1:
+                    if phase not in phases:
+                        phases.add(phase)
+                        yield self._pattern_to_svg(phase, left, top, unit, height)
+                    fill = f"url(#breakpoints-{phase})"
+                yield self._shape_to_svg(
                     {
                         "name": "rect",
-                        "x": left
-                        + (index - start) * (self.style.FULL_WIDTH / length)
-                        + self.style.TRANS_START,
+                        "x": left + (low - start) * unit + self.style.TRANS_START,
                         "y": top,
-                        "width": (self.style.FULL_WIDTH / length),
+                        "width": (high - low) * unit,
                         "height": height,
-                        "fill": self.style.BREAKPOINT_COLOR_LIST[i % len(self.style.BREAKPOINT_COLOR_LIST)],
+                        "fill": fill,
                         "fill-opacity": 0.4,
                     }
                 )
-        return svg
+            count += last - first
+
+    def _pattern_to_svg(self, phase, left, top, unit, height):
+        """
+        Define the pattern of breakpoint colors that starts with the color at
+        `phase` at the first time unit of the window.
+        """
+        colors = self.style.BREAKPOINT_COLOR_LIST
+        tiles = "".join(
+            self._shape_to_svg(
+                {
+                    "name": "rect",
+                    "x": index * unit,
+                    "y": 0,
+                    "width": unit,
+                    "height": height,
+                    "fill": colors[(phase + index) % len(colors)],
+                }
+            )
+            for index in range(len(colors))
+        )
+        return self._shape_to_svg(
+            {
+                "name": "defs",
+                "content": self._shape_to_svg(
+                    {
+                        "name": "pattern",
+                        "id": f"breakpoints-{phase}",
+                        "x": left + self.style.TRANS_START,
+                        "y": top,
+                        "width": len(colors) * unit,
+                        "height": height,
+                        "patternUnits": "userSpaceOnUse",
+                        "content": tiles,
+                    }
+                ),
+            }
+        )
 
     def _wiregroup_to_svg(
         self, wiregroup, left, top, start, length, wires=None, vector_radix=10
     ):
-        svg = ""
+        """Yields the svg of the wires of a group, and returns the number of wires."""
         index = 0
         for wire in wiregroup.wires:
             if wires == None or wire.name in wires:
                 if wires:  # ensure only one copy of the wire is included
                     wires.remove(wire.name)
-                svg += self._wire_to_svg(
+                yield from self._wire_to_svg(
                     wire,
                     left=left,
                     top=top
@@ -230,7 +311,7 @@ class Visualizer:
                 index += 1
         # recursively call function on nested wiregroups
         for group in wiregroup.groups:
-            result = self._wiregroup_to_svg(
+            index += yield from self._wiregroup_to_svg(
                 group,
                 left=left,
                 top=top + (index * (self.style.WIRE_HEIGHT + self.style.WIRE_MARGIN)),
@@ -239,12 +320,10 @@ class Visualizer:
                 wires=wires,
                 vector_radix=vector_radix,
             )
-            svg += result[0]
-            index += result[1]
-        return svg, index
+        return index
 
     def _wire_to_svg(self, wire, left, top, start, length, vector_radix=10):
-        svg = self._shape_to_svg(
+        yield self._shape_to_svg(
             {
                 "name": "text",
                 "x": left,
@@ -259,20 +338,154 @@ class Visualizer:
                 ),
             }
         )
-        for index in range(start, start + length):
-            svg += self._value_to_svg(
-                prev=wire[index - 1] if index > 0 else wire[index],
-                value=wire[index],
-                width=wire.width(),
-                left=left
-                + ((index - start) * (self.style.FULL_WIDTH / length))
-                + self.style.TEXT_WIDTH,
+        if length >= self.style.SUMMARY_UNITS * self.style.FULL_WIDTH:
+            yield from self._summary_to_svg(
+                wire,
+                left=left + self.style.TEXT_WIDTH,
                 top=top,
+                start=start,
                 length=length,
-                initial=(index == start),
                 vector_radix=vector_radix,
             )
-        return svg
+            return
+        if length <= 0:
+            return
+        # The wire is drawn from its changes in the window: each change is drawn
+        # as a transition, followed by a single run up to the next change.
+        prev = wire[start - 1] if start > 0 else None
+        value = wire[start]
+        first, end = start, start + length  # first time of the current run
+        for time, change in wire._data.window(start, end):
+            if change == value:
+                continue
+            yield self._run_to_svg(
+                wire, prev, value, left, top, start, length, first, time, vector_radix
+            )
+            prev, value, first = value, change, time
+        yield self._run_to_svg(
+            wire, prev, value, left, top, start, length, first, end, vector_radix
+        )
+
+    def _run_to_svg(
+        self, wire, prev, value, left, top, start, length, first, stop, vector_radix
+    ):
+        """Draw a run of a wire with a stable value, from `first` to before `stop`."""
+        return self._value_to_svg(
+            prev=value if first == 0 else prev,
+            value=value,
+            width=wire.width(),
+            left=left
+            + ((first - start) * (self.style.FULL_WIDTH / length))
+            + self.style.TEXT_WIDTH,
+            top=top,
+            length=length,
+            initial=(first == start),
+            vector_radix=vector_radix,
+            span=stop - first,
+        )
+
+    def _summary_to_svg(self, wire, left, top, start, length, vector_radix=10):
+        """
+        Draw a wire over a long window of time from the summaries of its values,
+        with one block per pixel column, merging the runs of equal blocks. Columns
+        with x values are drawn as x, and columns with changes as a filled block.
+        """
+        columns = int(self.style.FULL_WIDTH)
+        width = wire.width()
+        runs = []  # [kind, first column, stop column] of each run of blocks
+        for column in range(columns):
+            transitions, low, high, flags = wire.summary(
+                start + column * length // columns,
+                start + (column + 1) * length // columns,
+            )
+            if flags & summary.X:
+                kind = "x"
+            elif flags & summary.Z and width == 1:
+                kind = "z"
+            elif transitions:
+                kind = "changes"
+            else:
+                kind = ("value", low)
+            if runs and runs[-1][0] == kind:
+                runs[-1][2] = column + 1
+            else:
+                runs.append([kind, column, column + 1])
+
+        for kind, first, stop in runs:
+            x1 = left + first * (self.style.FULL_WIDTH / columns)
+            x2 = left + stop * (self.style.FULL_WIDTH / columns)
+            if kind in ("x", "changes"):
+                color = self.style.LINE_COLOR_X
+                if kind == "changes":
+                    color = self.style.LINE_COLOR_HIGH
+                    if width > 1:
+                        color = self.style.LINE_COLOR_DATA
+                yield self._shape_to_svg(
+                    {
+                        "name": "rect",
+                        "x": x1,
+                        "y": top,
+                        "width": x2 - x1,
+                        "height": self.style.WIRE_HEIGHT,
+                        "stroke": color,
+                        "fill": color,
+                    }
+                )
+            elif kind == "z":
+                yield self._shape_to_svg(
+                    {
+                        "name": "line",
+                        "x1": x1,
+                        "x2": x2,
+                        "y1": (top + (self.style.WIRE_HEIGHT) / 2),
+                        "y2": (top + (self.style.WIRE_HEIGHT) / 2),
+                        "stroke": self.style.LINE_COLOR_Z,
+                    }
+                )
+            elif width == 1:
+                high = kind[1] == 1
+                yield self._shape_to_svg(
+                    {
+                        "name": "line",
+                        "x1": x1,
+                        "x2": x2,
+                        "y1": top if high else top + self.style.WIRE_HEIGHT,
+                        "y2": top if high else top + self.style.WIRE_HEIGHT,
+                        "stroke": self.style.LINE_COLOR_HIGH
+                        if high
+                        else self.style.LINE_COLOR_LOW,
+                    }
+                )
+            else:
+                for y in (top, top + self.style.WIRE_HEIGHT):
+                    yield self._shape_to_svg(
+                        {
+                            "name": "line",
+                            "x1": x1,
+                            "x2": x2,
+                            "y1": y,
+                            "y2": y,
+                            "stroke": self.style.LINE_COLOR_DATA,
+                        }
+                    )
+                value = kind[1]
+                if value is None:
+                    continue
+                if vector_radix != 10:
+                    value = dec2anybase(value, vector_radix, width)
+                if (len(str(value)) + 1) * self.style.CHAR_WIDTH <= x2 - x1:
+                    yield self._shape_to_svg(
+                        {
+                            "name": "text",
+                            "x": x1 + 5,
+                            "y": top
+                            + (self.style.WIRE_HEIGHT + self.style.WIRE_MARGIN) / 2,
+                            "class": "small",
+                            "fill": self.style.TEXT_COLOR,
+                            "font-family": "monospace",
+                            "content": value,
+                        }
+                    )
 
     class ValueType(Enum):
         LOW = 0
@@ -283,14 +496,16 @@ class Visualizer:
 
     @staticmethod
     def type_from_value(value, width=1):
+        if isinstance(value, str):
+            value = Logic.from_str(value)
         if width == 1:
-            if value in (0, "0"):
+            if value == 0:
                 return Visualizer.ValueType.LOW
-            elif value in (1, "1"):
+            elif value == 1:
                 return Visualizer.ValueType.HIGH
-            elif value in ("x", "X"):
-                return Visualizer.ValueType.X
-            elif value in ("z", "Z"):
+            elif type(value) is Logic:
+                if value.value & value.mask:
+                    return Visualizer.ValueType.X
                 return Visualizer.ValueType.Z
             elif value is None:
                 return Visualizer.ValueType.X
@@ -299,22 +514,93 @@ class Visualizer:
                     f"Invalid wire value, unable to visualize: {value}"
                 )
         else:
-            if "x" in str(value):
+            if type(value) is Logic and value.value & value.mask:
                 return Visualizer.ValueType.X
             else:
                 return Visualizer.ValueType.DATA
 
     def _value_to_svg(
-        self, prev, value, width, left, top, length, initial=False, vector_radix=10
+        self,
+        prev,
+        value,
+        width,
+        left,
+        top,
+        length,
+        initial=False,
+        vector_radix=10,
+        span=1,
     ):
+        """
+        Draw the transition of a wire from `prev` to `value`, followed by the
+        stable value for the rest of a run of `span` time units.
+        """
+        run = span * self.style.FULL_WIDTH / length  # width of the run
         # deduce types from wire width and value:
         prev_type = Visualizer.type_from_value(prev, width)
         value_type = Visualizer.type_from_value(value, width)
-        is_transitioning = prev != value
+        changing = prev != value or initial
 
         if vector_radix != 10 and value_type == Visualizer.ValueType.DATA:
             value = dec2anybase(value, vector_radix, width)
 
+        return self._template(prev_type, value_type, changing)(left, top, run, value)
+
+    def _template(self, prev_type, value_type, changing):
+        """
+        Returns a function of (left, top, run, value) to the svg of the shapes
+        of a transition for the style. The svg of the shapes is formatted once
+        per style and transition, with a replacement field for each coordinate.
+        """
+        key = (self.style, prev_type, value_type, changing)
+        template = Visualizer._templates.get(key)
+        if template is None:
+            fields = {name: "{%s!s}" % name for name in Visualizer.COORDINATES}
+            shapes = self._shapes(prev_type, value_type, changing, fields)
+            source = "".join(
+                self._shape_to_svg(
+                    {
+                        prop: value
+                        if value in fields.values()
+                        else str(value).replace("{", "{{").replace("}", "}}")
+                        for prop, value in shape.items()
+                    }
+                )
+                for shape in shapes
+            )
+            coordinates = self._coordinates
+            template = lambda left, top, run, value: source.format_map(
+                coordinates(left, top, run, value)
+            )
+            Visualizer._templates[key] = template
+        return template
+
+    def _coordinates(self, left, top, run, value):
+        """Returns the coordinates of the shapes of a transition, by name."""
+        data = left + self.style.TRANS_START + self.style.TRANS_WIDTH
+        return {
+            "left": left,
+            "right": left + run,
+            "top": top,
+            "bottom": top + self.style.WIRE_HEIGHT,
+            "middle": top + self.style.WIRE_HEIGHT / 2,
+            "trans": left + self.style.TRANS_START,
+            "block": left
+            + self.style.TRANS_START
+            + self.style.TRANS_WIDTH * self.style.BLOCK_TRANS,
+            "data": data,
+            "text_x": data + 5,  # TODO: generalize formula
+            "text_y": top + (self.style.WIRE_HEIGHT + self.style.WIRE_MARGIN) / 2,
+            "run": run,
+            "value": value,
+        }
+
+    def _shapes(self, prev_type, value_type, changing, at):
+        """
+        Returns the list of shapes drawn for a transition, from `at["left"]` to
+        `at["right"]`, given the coordinates of `_coordinates`. The transition
+        is drawn if `changing` is true.
+        """
         # The following code builds a list of svg objects depending on the
         # current and previous value of the wire.
         shapes = []
@@ -325,10 +611,10 @@ class Visualizer:
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left,
-                    "x2": left + (self.style.FULL_WIDTH / length),
-                    "y1": top + self.style.WIRE_HEIGHT,
-                    "y2": top + self.style.WIRE_HEIGHT,
+                    "x1": at["left"],
+                    "x2": at["right"],
+                    "y1": at["bottom"],
+                    "y2": at["bottom"],
                     "stroke": self.style.LINE_COLOR_LOW,
                 }
             )
@@ -339,34 +625,30 @@ class Visualizer:
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left,
-                    "x2": left + self.style.TRANS_START,
-                    "y1": top + self.style.WIRE_HEIGHT,
-                    "y2": top + self.style.WIRE_HEIGHT,
+                    "x1": at["left"],
+                    "x2": at["trans"],
+                    "y1": at["bottom"],
+                    "y2": at["bottom"],
                     "stroke": self.style.LINE_COLOR_LOW,
                 }
             )
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left + self.style.TRANS_START,
-                    "x2": left
-                    + self.style.TRANS_START
-                    + self.style.TRANS_WIDTH * self.style.BLOCK_TRANS,
-                    "y1": top + self.style.WIRE_HEIGHT,
-                    "y2": top,
+                    "x1": at["trans"],
+                    "x2": at["block"],
+                    "y1": at["bottom"],
+                    "y2": at["top"],
                     "stroke": self.style.LINE_COLOR_HIGH,
                 }
             )
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left
-                    + self.style.TRANS_START
-                    + self.style.TRANS_WIDTH * self.style.BLOCK_TRANS,
-                    "x2": left + (self.style.FULL_WIDTH / length),
-                    "y1": top,
-                    "y2": top,
+                    "x1": at["block"],
+                    "x2": at["right"],
+                    "y1": at["top"],
+                    "y2": at["top"],
                     "stroke": self.style.LINE_COLOR_HIGH,
                 }
             )
@@ -377,34 +659,30 @@ class Visualizer:
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left,
-                    "x2": left + self.style.TRANS_START,
-                    "y1": top,
-                    "y2": top,
+                    "x1": at["left"],
+                    "x2": at["trans"],
+                    "y1": at["top"],
+                    "y2": at["top"],
                     "stroke": self.style.LINE_COLOR_HIGH,
                 }
             )
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left + self.style.TRANS_START,
-                    "x2": left
-                    + self.style.TRANS_START
-                    + self.style.TRANS_WIDTH * self.style.BLOCK_TRANS,
-                    "y1": top,
-                    "y2": top + self.style.WIRE_HEIGHT,
+                    "x1": at["trans"],
+                    "x2": at["block"],
+                    "y1": at["top"],
+                    "y2": at["bottom"],
                     "stroke": self.style.LINE_COLOR_LOW,
                 }
             )
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left
-                    + self.style.TRANS_START
-                    + self.style.TRANS_WIDTH * self.style.BLOCK_TRANS,
-                    "x2": left + (self.style.FULL_WIDTH / length),
-                    "y1": top + self.style.WIRE_HEIGHT,
-                    "y2": top + self.style.WIRE_HEIGHT,
+                    "x1": at["block"],
+                    "x2": at["right"],
+                    "y1": at["bottom"],
+                    "y2": at["bottom"],
                     "stroke": self.style.LINE_COLOR_LOW,
                 }
             )
@@ -415,10 +693,10 @@ class Visualizer:
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left,
-                    "x2": left + (self.style.FULL_WIDTH / length),
-                    "y1": top,
-                    "y2": top,
+                    "x1": at["left"],
+                    "x2": at["right"],
+                    "y1": at["top"],
+                    "y2": at["top"],
                     "stroke": self.style.LINE_COLOR_HIGH,
                 }
             )
@@ -429,30 +707,30 @@ class Visualizer:
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left,
-                    "x2": left + (self.style.FULL_WIDTH / length),
-                    "y1": top + self.style.WIRE_HEIGHT,
-                    "y2": top + self.style.WIRE_HEIGHT,
+                    "x1": at["left"],
+                    "x2": at["right"],
+                    "y1": at["bottom"],
+                    "y2": at["bottom"],
                     "stroke": self.style.LINE_COLOR_DATA,
                 }
             )
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left + self.style.TRANS_START,
-                    "x2": left + self.style.TRANS_START + self.style.TRANS_WIDTH,
-                    "y1": top + self.style.WIRE_HEIGHT,
-                    "y2": top,
+                    "x1": at["trans"],
+                    "x2": at["data"],
+                    "y1": at["bottom"],
+                    "y2": at["top"],
                     "stroke": self.style.LINE_COLOR_DATA,
                 }
             )
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left + self.style.TRANS_START + self.style.TRANS_WIDTH,
-                    "x2": left + (self.style.FULL_WIDTH / length),
-                    "y1": top,
-                    "y2": top,
+                    "x1": at["data"],
+                    "x2": at["right"],
+                    "y1": at["top"],
+                    "y2": at["top"],
                     "stroke": self.style.LINE_COLOR_DATA,
                 }
             )
@@ -463,30 +741,30 @@ class Visualizer:
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left,
-                    "x2": left + (self.style.FULL_WIDTH / length),
-                    "y1": top,
-                    "y2": top,
+                    "x1": at["left"],
+                    "x2": at["right"],
+                    "y1": at["top"],
+                    "y2": at["top"],
                     "stroke": self.style.LINE_COLOR_DATA,
                 }
             )
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left + self.style.TRANS_START,
-                    "x2": left + self.style.TRANS_START + self.style.TRANS_WIDTH,
-                    "y1": top,
-                    "y2": top + self.style.WIRE_HEIGHT,
+                    "x1": at["trans"],
+                    "x2": at["data"],
+                    "y1": at["top"],
+                    "y2": at["bottom"],
                     "stroke": self.style.LINE_COLOR_DATA,
                 }
             )
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left + self.style.TRANS_START + self.style.TRANS_WIDTH,
-                    "x2": left + (self.style.FULL_WIDTH / length),
-                    "y1": top + self.style.WIRE_HEIGHT,
-                    "y2": top + self.style.WIRE_HEIGHT,
+                    "x1": at["data"],
+                    "x2": at["right"],
+                    "y1": at["bottom"],
+                    "y2": at["bottom"],
                     "stroke": self.style.LINE_COLOR_DATA,
                 }
             )
@@ -497,40 +775,40 @@ class Visualizer:
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left,
-                    "x2": left + self.style.TRANS_START,
-                    "y1": top,
-                    "y2": top,
+                    "x1": at["left"],
+                    "x2": at["trans"],
+                    "y1": at["top"],
+                    "y2": at["top"],
                     "stroke": self.style.LINE_COLOR_DATA,
                 }
             )
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left + self.style.TRANS_START,
-                    "x2": left + self.style.TRANS_START + self.style.TRANS_WIDTH,
-                    "y1": top,
-                    "y2": top + self.style.WIRE_HEIGHT,
+                    "x1": at["trans"],
+                    "x2": at["data"],
+                    "y1": at["top"],
+                    "y2": at["bottom"],
                     "stroke": self.style.LINE_COLOR_DATA,
                 }
             )
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left,
-                    "x2": left + self.style.TRANS_START + self.style.TRANS_WIDTH,
-                    "y1": top + self.style.WIRE_HEIGHT,
-                    "y2": top + self.style.WIRE_HEIGHT,
+                    "x1": at["left"],
+                    "x2": at["data"],
+                    "y1": at["bottom"],
+                    "y2": at["bottom"],
                     "stroke": self.style.LINE_COLOR_DATA,
                 }
             )
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left + self.style.TRANS_START + self.style.TRANS_WIDTH,
-                    "x2": left + (self.style.FULL_WIDTH / length),
-                    "y1": top + self.style.WIRE_HEIGHT,
-                    "y2": top + self.style.WIRE_HEIGHT,
+                    "x1": at["data"],
+                    "x2": at["right"],
+                    "y1": at["bottom"],
+                    "y2": at["bottom"],
                     "stroke": self.style.LINE_COLOR_LOW,
                 }
             )
@@ -541,66 +819,65 @@ class Visualizer:
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left,
-                    "x2": left + self.style.TRANS_START,
-                    "y1": top + self.style.WIRE_HEIGHT,
-                    "y2": top + self.style.WIRE_HEIGHT,
+                    "x1": at["left"],
+                    "x2": at["trans"],
+                    "y1": at["bottom"],
+                    "y2": at["bottom"],
                     "stroke": self.style.LINE_COLOR_DATA,
                 }
             )
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left + self.style.TRANS_START,
-                    "x2": left + self.style.TRANS_START + self.style.TRANS_WIDTH,
-                    "y1": top + self.style.WIRE_HEIGHT,
-                    "y2": top,
+                    "x1": at["trans"],
+                    "x2": at["data"],
+                    "y1": at["bottom"],
+                    "y2": at["top"],
                     "stroke": self.style.LINE_COLOR_DATA,
                 }
             )
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left,
-                    "x2": left + self.style.TRANS_START + self.style.TRANS_WIDTH,
-                    "y1": top,
-                    "y2": top,
+                    "x1": at["left"],
+                    "x2": at["data"],
+                    "y1": at["top"],
+                    "y2": at["top"],
                     "stroke": self.style.LINE_COLOR_DATA,
                 }
             )
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left + self.style.TRANS_START + self.style.TRANS_WIDTH,
-                    "x2": left + (self.style.FULL_WIDTH / length),
-                    "y1": top,
-                    "y2": top,
+                    "x1": at["data"],
+                    "x2": at["right"],
+                    "y1": at["top"],
+                    "y2": at["top"],
                     "stroke": self.style.LINE_COLOR_HIGH,
                 }
             )
         elif (
             prev_type is Visualizer.ValueType.DATA
             and value_type is Visualizer.ValueType.DATA
-            and not is_transitioning
-            and not initial
+            and not changing
         ):
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left,
-                    "x2": left + (self.style.FULL_WIDTH / length),
-                    "y1": top + self.style.WIRE_HEIGHT,
-                    "y2": top + self.style.WIRE_HEIGHT,
+                    "x1": at["left"],
+                    "x2": at["right"],
+                    "y1": at["bottom"],
+                    "y2": at["bottom"],
                     "stroke": self.style.LINE_COLOR_DATA,
                 }
             )
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left,
-                    "x2": left + (self.style.FULL_WIDTH / length),
-                    "y1": top,
-                    "y2": top,
+                    "x1": at["left"],
+                    "x2": at["right"],
+                    "y1": at["top"],
+                    "y2": at["top"],
                     "stroke": self.style.LINE_COLOR_DATA,
                 }
             )
@@ -611,75 +888,72 @@ class Visualizer:
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left,
-                    "x2": left + self.style.TRANS_START,
-                    "y1": top,
-                    "y2": top,
+                    "x1": at["left"],
+                    "x2": at["trans"],
+                    "y1": at["top"],
+                    "y2": at["top"],
                     "stroke": self.style.LINE_COLOR_DATA,
                 }
             )
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left + self.style.TRANS_START,
-                    "x2": left + self.style.TRANS_START + self.style.TRANS_WIDTH,
-                    "y1": top,
-                    "y2": top + self.style.WIRE_HEIGHT,
+                    "x1": at["trans"],
+                    "x2": at["data"],
+                    "y1": at["top"],
+                    "y2": at["bottom"],
                     "stroke": self.style.LINE_COLOR_DATA,
                 }
             )
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left + self.style.TRANS_START + self.style.TRANS_WIDTH,
-                    "x2": left + (self.style.FULL_WIDTH / length),
-                    "y1": top + self.style.WIRE_HEIGHT,
-                    "y2": top + self.style.WIRE_HEIGHT,
+                    "x1": at["data"],
+                    "x2": at["right"],
+                    "y1": at["bottom"],
+                    "y2": at["bottom"],
                     "stroke": self.style.LINE_COLOR_DATA,
                 }
             )
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left,
-                    "x2": left + self.style.TRANS_START,
-                    "y1": top + self.style.WIRE_HEIGHT,
-                    "y2": top + self.style.WIRE_HEIGHT,
+                    "x1": at["left"],
+                    "x2": at["trans"],
+                    "y1": at["bottom"],
+                    "y2": at["bottom"],
                     "stroke": self.style.LINE_COLOR_DATA,
                 }
             )
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left + self.style.TRANS_START,
-                    "x2": left + self.style.TRANS_START + self.style.TRANS_WIDTH,
-                    "y1": top + self.style.WIRE_HEIGHT,
-                    "y2": top,
+                    "x1": at["trans"],
+                    "x2": at["data"],
+                    "y1": at["bottom"],
+                    "y2": at["top"],
                     "stroke": self.style.LINE_COLOR_DATA,
                 }
             )
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left + self.style.TRANS_START + self.style.TRANS_WIDTH,
-                    "x2": left + (self.style.FULL_WIDTH / length),
-                    "y1": top,
-                    "y2": top,
+                    "x1": at["data"],
+                    "x2": at["right"],
+                    "y1": at["top"],
+                    "y2": at["top"],
                     "stroke": self.style.LINE_COLOR_DATA,
                 }
             )
             shapes.append(
                 {
                     "name": "text",
-                    "x": left
-                    + self.style.TRANS_START
-                    + self.style.TRANS_WIDTH
-                    + 5,  # TODO: generalize formula
-                    "y": top + (self.style.WIRE_HEIGHT + self.style.WIRE_MARGIN) / 2,
+                    "x": at["text_x"],
+                    "y": at["text_y"],
                     "class": "small",
                     "fill": self.style.TEXT_COLOR,
                     "font-family": "monospace",
-                    "content": value,
+                    "content": at["value"],
                 }
             )
         # TODO: figure out how to display X values in svg:
@@ -690,19 +964,19 @@ class Visualizer:
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left,
-                    "x2": left + self.style.TRANS_START,
-                    "y1": top + self.style.WIRE_HEIGHT,
-                    "y2": top + self.style.WIRE_HEIGHT,
+                    "x1": at["left"],
+                    "x2": at["trans"],
+                    "y1": at["bottom"],
+                    "y2": at["bottom"],
                     "stroke": self.style.LINE_COLOR_LOW,
                 }
             )
             shapes.append(
                 {
                     "name": "rect",
-                    "x": left,
-                    "y": top,
-                    "width": (self.style.FULL_WIDTH / length),
+                    "x": at["left"],
+                    "y": at["top"],
+                    "width": at["run"],
                     "height": self.style.WIRE_HEIGHT,
                     "stroke": self.style.LINE_COLOR_X,
                     "fill": self.style.LINE_COLOR_X,
@@ -715,19 +989,19 @@ class Visualizer:
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left,
-                    "x2": left + self.style.TRANS_START,
-                    "y1": top,
-                    "y2": top,
+                    "x1": at["left"],
+                    "x2": at["trans"],
+                    "y1": at["top"],
+                    "y2": at["top"],
                     "stroke": self.style.LINE_COLOR_HIGH,
                 }
             )
             shapes.append(
                 {
                     "name": "rect",
-                    "x": left,
-                    "y": top,
-                    "width": (self.style.FULL_WIDTH / length),
+                    "x": at["left"],
+                    "y": at["top"],
+                    "width": at["run"],
                     "height": self.style.WIRE_HEIGHT,
                     "stroke": self.style.LINE_COLOR_X,
                     "fill": self.style.LINE_COLOR_X,
@@ -740,19 +1014,19 @@ class Visualizer:
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left,
-                    "x2": left + (self.style.FULL_WIDTH / length),
-                    "y1": top + self.style.WIRE_HEIGHT,
-                    "y2": top + self.style.WIRE_HEIGHT,
+                    "x1": at["left"],
+                    "x2": at["right"],
+                    "y1": at["bottom"],
+                    "y2": at["bottom"],
                     "stroke": self.style.LINE_COLOR_X,
                 }
             )
             shapes.append(
                 {
                     "name": "rect",
-                    "x": left,
-                    "y": top,
-                    "width": (self.style.FULL_WIDTH / length),
+                    "x": at["left"],
+                    "y": at["top"],
+                    "width": at["run"],
                     "height": self.style.WIRE_HEIGHT,
                     "stroke": self.style.LINE_COLOR_X,
                     "fill": self.style.LINE_COLOR_X,
@@ -765,8 +1039,8 @@ class Visualizer:
             shapes.append(
                 {
                     "name": "rect",
-                    "x": left,
-                    "y": top,
+                    "x": at["left"],
+                    "y": at["top"],
                     "width": self.style.TRANS_START,
                     "height": self.style.WIRE_HEIGHT,
                     "stroke": self.style.LINE_COLOR_X,
@@ -776,10 +1050,10 @@ class Visualizer:
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left + self.style.TRANS_START,
-                    "x2": left + (self.style.FULL_WIDTH / length),
-                    "y1": top + self.style.WIRE_HEIGHT,
-                    "y2": top + self.style.WIRE_HEIGHT,
+                    "x1": at["trans"],
+                    "x2": at["right"],
+                    "y1": at["bottom"],
+                    "y2": at["bottom"],
                     "stroke": self.style.LINE_COLOR_LOW,
                 }
             )
@@ -790,8 +1064,8 @@ class Visualizer:
             shapes.append(
                 {
                     "name": "rect",
-                    "x": left,
-                    "y": top,
+                    "x": at["left"],
+                    "y": at["top"],
                     "width": self.style.TRANS_START,
                     "height": self.style.WIRE_HEIGHT,
                     "stroke": self.style.LINE_COLOR_X,
@@ -801,10 +1075,10 @@ class Visualizer:
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left + self.style.TRANS_START,
-                    "x2": left + (self.style.FULL_WIDTH / length),
-                    "y1": top,
-                    "y2": top,
+                    "x1": at["trans"],
+                    "x2": at["right"],
+                    "y1": at["top"],
+                    "y2": at["top"],
                     "stroke": self.style.LINE_COLOR_HIGH,
                 }
             )
@@ -815,9 +1089,9 @@ class Visualizer:
             shapes.append(
                 {
                     "name": "rect",
-                    "x": left,
-                    "y": top,
-                    "width": (self.style.FULL_WIDTH / length),
+                    "x": at["left"],
+                    "y": at["top"],
+                    "width": at["run"],
                     "height": self.style.WIRE_HEIGHT,
                     "stroke": self.style.LINE_COLOR_X,
                     "fill": self.style.LINE_COLOR_X,
@@ -826,10 +1100,10 @@ class Visualizer:
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left,
-                    "x2": left + (self.style.FULL_WIDTH / length),
-                    "y1": top,
-                    "y2": top,
+                    "x1": at["left"],
+                    "x2": at["right"],
+                    "y1": at["top"],
+                    "y2": at["top"],
                     "stroke": self.style.LINE_COLOR_X,
                 }
             )
@@ -839,9 +1113,9 @@ class Visualizer:
             shapes.append(
                 {
                     "name": "rect",
-                    "x": left,
-                    "y": top,
-                    "width": (self.style.FULL_WIDTH / length),
+                    "x": at["left"],
+                    "y": at["top"],
+                    "width": at["run"],
                     "height": self.style.WIRE_HEIGHT,
                     "stroke": self.style.LINE_COLOR_X,
                     "fill": self.style.LINE_COLOR_X,
@@ -855,32 +1129,30 @@ class Visualizer:
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left,
-                    "x2": left + self.style.TRANS_START,
-                    "y1": top + self.style.WIRE_HEIGHT,
-                    "y2": top + self.style.WIRE_HEIGHT,
+                    "x1": at["left"],
+                    "x2": at["trans"],
+                    "y1": at["bottom"],
+                    "y2": at["bottom"],
                     "stroke": self.style.LINE_COLOR_LOW,
                 }
             )
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left + self.style.TRANS_START,
-                    "x2": left
-                    + self.style.TRANS_START
-                    + self.style.TRANS_WIDTH * self.style.BLOCK_TRANS,
-                    "y1": top + self.style.WIRE_HEIGHT,
-                    "y2": (top + (self.style.WIRE_HEIGHT) / 2),
+                    "x1": at["trans"],
+                    "x2": at["block"],
+                    "y1": at["bottom"],
+                    "y2": at["middle"],
                     "stroke": self.style.LINE_COLOR_Z,
                 }
             )
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left + self.style.TRANS_START,
-                    "x2": left + (self.style.FULL_WIDTH / length),
-                    "y1": (top + (self.style.WIRE_HEIGHT) / 2),
-                    "y2": (top + (self.style.WIRE_HEIGHT) / 2),
+                    "x1": at["trans"],
+                    "x2": at["right"],
+                    "y1": at["middle"],
+                    "y2": at["middle"],
                     "stroke": self.style.LINE_COLOR_Z,
                 }
             )
@@ -891,34 +1163,30 @@ class Visualizer:
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left,
-                    "x2": left + self.style.TRANS_START,
-                    "y1": top,
-                    "y2": top,
+                    "x1": at["left"],
+                    "x2": at["trans"],
+                    "y1": at["top"],
+                    "y2": at["top"],
                     "stroke": self.style.LINE_COLOR_HIGH,
                 }
             )
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left + self.style.TRANS_START,
-                    "x2": left
-                    + self.style.TRANS_START
-                    + self.style.TRANS_WIDTH * self.style.BLOCK_TRANS,
-                    "y1": top,
-                    "y2": (top + (self.style.WIRE_HEIGHT) / 2),
+                    "x1": at["trans"],
+                    "x2": at["block"],
+                    "y1": at["top"],
+                    "y2": at["middle"],
                     "stroke": self.style.LINE_COLOR_Z,
                 }
             )
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left
-                    + self.style.TRANS_START
-                    + self.style.TRANS_WIDTH * self.style.BLOCK_TRANS,
-                    "x2": left + (self.style.FULL_WIDTH / length),
-                    "y1": (top + (self.style.WIRE_HEIGHT) / 2),
-                    "y2": (top + (self.style.WIRE_HEIGHT) / 2),
+                    "x1": at["block"],
+                    "x2": at["right"],
+                    "y1": at["middle"],
+                    "y2": at["middle"],
                     "stroke": self.style.LINE_COLOR_Z,
                 }
             )
@@ -929,20 +1197,20 @@ class Visualizer:
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left,
-                    "x2": left + (self.style.FULL_WIDTH / length),
-                    "y1": top + self.style.WIRE_HEIGHT,
-                    "y2": top + self.style.WIRE_HEIGHT,
+                    "x1": at["left"],
+                    "x2": at["right"],
+                    "y1": at["bottom"],
+                    "y2": at["bottom"],
                     "stroke": self.style.LINE_COLOR_X,
                 }
             )
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left,
-                    "x2": left + (self.style.FULL_WIDTH / length),
-                    "y1": (top + (self.style.WIRE_HEIGHT) / 2),
-                    "y2": (top + (self.style.WIRE_HEIGHT) / 2),
+                    "x1": at["left"],
+                    "x2": at["right"],
+                    "y1": at["middle"],
+                    "y2": at["middle"],
                     "stroke": self.style.LINE_COLOR_Z,
                 }
             )
@@ -952,8 +1220,8 @@ class Visualizer:
             shapes.append(
                 {
                     "name": "rect",
-                    "x": left,
-                    "y": top,
+                    "x": at["left"],
+                    "y": at["top"],
                     "width": self.style.TRANS_START,
                     "height": self.style.WIRE_HEIGHT,
                     "stroke": self.style.LINE_COLOR_X,
@@ -963,10 +1231,10 @@ class Visualizer:
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left + self.style.TRANS_START,
-                    "x2": left + (self.style.FULL_WIDTH / length),
-                    "y1": (top + (self.style.WIRE_HEIGHT) / 2),
-                    "y2": (top + (self.style.WIRE_HEIGHT) / 2),
+                    "x1": at["trans"],
+                    "x2": at["right"],
+                    "y1": at["middle"],
+                    "y2": at["middle"],
                     "stroke": self.style.LINE_COLOR_Z,
                 }
             )
@@ -977,34 +1245,30 @@ class Visualizer:
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left,
-                    "x2": left + self.style.TRANS_START,
-                    "y1": (top + (self.style.WIRE_HEIGHT) / 2),
-                    "y2": (top + (self.style.WIRE_HEIGHT) / 2),
+                    "x1": at["left"],
+                    "x2": at["trans"],
+                    "y1": at["middle"],
+                    "y2": at["middle"],
                     "stroke": self.style.LINE_COLOR_Z,
                 }
             )
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left + self.style.TRANS_START,
-                    "x2": left
-                    + self.style.TRANS_START
-                    + self.style.TRANS_WIDTH * self.style.BLOCK_TRANS,
-                    "y1": (top + (self.style.WIRE_HEIGHT) / 2),
-                    "y2": top + self.style.WIRE_HEIGHT,
+                    "x1": at["trans"],
+                    "x2": at["block"],
+                    "y1": at["middle"],
+                    "y2": at["bottom"],
                     "stroke": self.style.LINE_COLOR_LOW,
                 }
             )
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left
-                    + self.style.TRANS_START
-                    + self.style.TRANS_WIDTH * self.style.BLOCK_TRANS,
-                    "x2": left + (self.style.FULL_WIDTH / length),
-                    "y1": top + self.style.WIRE_HEIGHT,
-                    "y2": top + self.style.WIRE_HEIGHT,
+                    "x1": at["block"],
+                    "x2": at["right"],
+                    "y1": at["bottom"],
+                    "y2": at["bottom"],
                     "stroke": self.style.LINE_COLOR_LOW,
                 }
             )
@@ -1015,32 +1279,30 @@ class Visualizer:
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left,
-                    "x2": left + self.style.TRANS_START,
-                    "y1": (top + (self.style.WIRE_HEIGHT) / 2),
-                    "y2": (top + (self.style.WIRE_HEIGHT) / 2),
+                    "x1": at["left"],
+                    "x2": at["trans"],
+                    "y1": at["middle"],
+                    "y2": at["middle"],
                     "stroke": self.style.LINE_COLOR_Z,
                 }
             )
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left + self.style.TRANS_START,
-                    "x2": left
-                    + self.style.TRANS_START
-                    + self.style.TRANS_WIDTH * self.style.BLOCK_TRANS,
-                    "y1": (top + (self.style.WIRE_HEIGHT) / 2),
-                    "y2": top,
+                    "x1": at["trans"],
+                    "x2": at["block"],
+                    "y1": at["middle"],
+                    "y2": at["top"],
                     "stroke": self.style.LINE_COLOR_HIGH,
                 }
             )
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left + self.style.TRANS_START,
-                    "x2": left + (self.style.FULL_WIDTH / length),
-                    "y1": top,
-                    "y2": top,
+                    "x1": at["trans"],
+                    "x2": at["right"],
+                    "y1": at["top"],
+                    "y2": at["top"],
                     "stroke": self.style.LINE_COLOR_HIGH,
                 }
             )
@@ -1050,19 +1312,19 @@ class Visualizer:
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left,
-                    "x2": left + (self.style.FULL_WIDTH / length),
-                    "y1": (top + (self.style.WIRE_HEIGHT) / 2),
-                    "y2": (top + (self.style.WIRE_HEIGHT) / 2),
+                    "x1": at["left"],
+                    "x2": at["right"],
+                    "y1": at["middle"],
+                    "y2": at["middle"],
                     "stroke": self.style.LINE_COLOR_Z,
                 }
             )
             shapes.append(
                 {
                     "name": "rect",
-                    "x": left,
-                    "y": top,
-                    "width": (self.style.FULL_WIDTH / length),
+                    "x": at["left"],
+                    "y": at["top"],
+                    "width": at["run"],
                     "height": self.style.WIRE_HEIGHT,
                     "stroke": self.style.LINE_COLOR_X,
                     "fill": self.style.LINE_COLOR_X,
@@ -1074,10 +1336,10 @@ class Visualizer:
             shapes.append(
                 {
                     "name": "line",
-                    "x1": left,
-                    "x2": left + (self.style.FULL_WIDTH / length),
-                    "y1": (top + (self.style.WIRE_HEIGHT) / 2),
-                    "y2": (top + (self.style.WIRE_HEIGHT) / 2),
+                    "x1": at["left"],
+                    "x2": at["right"],
+                    "y1": at["middle"],
+                    "y2": at["middle"],
                     "stroke": self.style.LINE_COLOR_Z,
                 }
             )
@@ -1086,10 +1348,7 @@ class Visualizer:
                 f"Invalid wire transition, unable to visualize: {prev_type} to {value_type}"
             )
 
-        svg_data = ""
-        for shape in shapes:
-            svg_data += self._shape_to_svg(shape)
-        return svg_data
+        return shapes
 
     def _shape_to_svg(self, shape):
         """Convert a shape dictionary object to an svg string."""
@@ -1101,3 +1360,4 @@ class Visualizer:
             elif prop != "name":
                 start_tag += " " + prop + '="' + str(shape[prop]) + '"'
         return start_tag + end_tag
+
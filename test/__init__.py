@@ -1,6 +1,9 @@
 from .test_all import TestStringMethods
 from .test_general import TestGeneral
+from .test_index import TestIndex
 from .test_limits import TestLimits
 from .test_pyrtl import TestPyrtl
+from .test_scanner import TestScanner
+from .test_storage import TestStorage
 from .test_style import TestStyle
 from .test_wires import TestWires
@@ -1,6 +1,7 @@
-import re, sys
+import io, re, sys
 from subprocess import call, Popen, STDOUT, PIPE
 from sootty import WireTrace, Visualizer, VectorImage, Style
+from sootty.storage import IntervalSet
 
 import unittest
 
@@ -38,6 +39,57 @@ class TestGeneral(unittest.TestCase):
         image = Visualizer().to_svg(wiretrace, start=0, length=8)
         image.display()
 
+    def test_change_driven(self):
+        wiretrace = WireTrace.from_vcd("example/example3.vcd")
+        for name in ("clk", "pc", "mem_write"):
+            wire = wiretrace.find(name)
+            for start, length in ((0, 8), (10, 200), (100, 1000)):
+                svg = "".join(Visualizer()._wire_to_svg(wire, 0, 0, start, length))
+                # a label, and a bounded number of shapes per change
+                transitions = wire.summary(start, start + length)[0]
+                assert svg.count("/") <= 1 + 8 * (transitions + 1)
+
+    def test_streaming(self):
+        wiretrace = WireTrace.from_vcd("example/example2.vcd")
+        visualizer = Visualizer()
+        source = visualizer.to_svg(wiretrace, start=0, length=40).source
+        assert source.startswith("<svg") and source.endswith("</svg>")
+        image = visualizer.to_svg(wiretrace, start=0, length=40)
+        assert "".join(image.fragments()) == source
+        for image in (image, VectorImage(source)):
+            buffer = io.StringIO()
+            image.write(buffer)
+            assert buffer.getvalue() == source
+            assert "".join(image.fragments()) == source
+
+    def test_breakpoints(self):
+        breakpoints = IntervalSet([(0, 10**6), (10**6 + 5, 10**6 + 9)])
+        for style, patterns in ((Style.Default, 0), (Style.Colorful, 2)):
+            svg = "".join(
+                Visualizer(style)._breakpoints_to_svg(
+                    breakpoints, 0, 0, 10**6 - 10, 1000, 100
+                )
+            )
+            # one rect per interval in the window, and one pattern per phase
+            assert svg.count('fill-opacity="0.4"') == 2
+            assert svg.count("<pattern") == patterns
+
+    def test_templates(self):
+        visualizer = Visualizer(Style.Light)
+        for prev, value in ((0, 1), (1, 1), (None, 0), (3, 3), (2, 7), (None, 7)):
+            width = 1 if max(prev or 0, value) < 2 else 4
+            for changing in (False, True):
+                types = (
+                    Visualizer.type_from_value(prev, width),
+                    Visualizer.type_from_value(value, width),
+                    changing,
+                )
+                at = visualizer._coordinates(84.0, 45, 2.5, value)
+                shapes = visualizer._shapes(*types, at)
+                assert visualizer._template(*types)(84.0, 45, 2.5, value) == "".join(
+                    map(visualizer._shape_to_svg, shapes)
+                )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,37 @@
+import os, shutil, tempfile
+from sootty import WireTrace
+from sootty.index import TimeIndex
+from sootty.scanner import find_definitions_end
+
+import unittest
+
+
+class TestIndex(unittest.TestCase):
+    def test_seek(self):
+        with open("example/example3.vcd", "rb") as stream:
+            buffer = stream.read()
+        start = find_definitions_end(buffer)
+        index = TimeIndex.build(buffer, start, step=1 << 14)
+        self.assertGreater(len(index.points), 10)
+        offset, time, checkpoint = index.seek(2000)
+        self.assertLessEqual(time, 2000)
+        self.assertTrue(buffer[offset:].startswith(b"#%d" % time))
+        clk = WireTrace.from_vcd("example/example3.vcd").find("clk")
+        self.assertEqual(checkpoint[b"!"], clk[time - 1])
+
+    def test_load_window(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = shutil.copy("example/example3.vcd", directory)
+            full = WireTrace.from_vcd(filename)
+            for _ in range(2):  # build, then reuse the saved index
+                window = WireTrace.from_vcd(filename, start=1500, end=1600)
+                self.assertTrue(os.path.exists(TimeIndex.path(filename)))
+                for name in ("clk", "pc", "inst"):
+                    for time in range(1500, 1601):
+                        self.assertEqual(
+                            window.find(name)[time], full.find(name)[time]
+                        )
+
+
+if __name__ == "__main__":
+    unittest.main()
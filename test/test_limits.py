@@ -25,6 +25,12 @@ class TestLimits(unittest.TestCase):
             str(parser.parse("D1 & D2").pretty("\t")), "&\n\twire\tD1\n\twire\tD2\n"
         )
 
+    def test_wire_names(self):
+        self.assertEqual(
+            parser.wire_names("clk, after (acc clk == const 5) & (3 next data == time 2)"),
+            {"clk", "data"},
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
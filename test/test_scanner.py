@@ -0,0 +1,77 @@
+import os, tempfile
+from io import BytesIO
+from sootty import WireTrace
+from sootty.scanner import scan, split_sections
+from sootty.storage import wiretrace as module
+from sootty.exceptions import SoottyError
+from sootty.utils import evcd2vcd, evcd_strcpy, evcd_tokens
+
+import unittest
+from unittest import mock
+
+
+class TestScanner(unittest.TestCase):
+    def test_scan(self):
+        buffer = b'#0 1! b101\n"\n$comment 1! #5 $end\n#3\n0! bx1 " $dumpvars 1! $end\n'
+        for size in (1, 4, 1024):
+            changes = []
+            appenders = {
+                b"!": lambda time, value: changes.append(("!", time, value)),
+                b'"': lambda time, value: changes.append(('"', time, value)),
+            }
+            self.assertEqual(scan(buffer, appenders, size=size), 3)
+            self.assertEqual(
+                changes,
+                [("!", 0, 1), ('"', 0, 5), ("!", 3, 0), ('"', 3, "x1"), ("!", 3, 1)],
+            )
+
+    def test_comments(self):
+        wiretrace = WireTrace.from_vcd("example/IEEE_std_example.vcd")
+        self.assertEqual(wiretrace.length(), 2010)
+
+    def test_parallel(self):
+        buffer = b"$dumpvars 1! $end\n#1\n0!\n#2\n1!\n"
+        self.assertEqual(
+            split_sections(buffer, 0, None, 3), [(0, 18), (18, 24), (24, 30)]
+        )
+        for filename in ("example/CLA.vcd", "example/example3.vcd"):
+            expected = WireTrace.from_vcd(filename)
+            with mock.patch.object(module, "PARALLEL_SIZE", 256):
+                wiretrace = WireTrace.from_vcd(filename, jobs=4)
+            self.assertEqual(changes(wiretrace.root), changes(expected.root))
+
+    def test_evcd(self):
+        for size in (1, 3, 1024):
+            self.assertEqual(
+                list(evcd_tokens(BytesIO(b"#0 $dumpports\n pD 6 0 <0 "), size)),
+                [b"#0", b"$dumpports", b"pD", b"6", b"0", b"<0"],
+            )
+        self.assertEqual(evcd_strcpy(b"DUNZLHf", False), b"01xzzzz")
+        self.assertEqual(evcd_strcpy(b"DUNZLHf", True), b"zzzz01z")
+        self.assertRaises(SoottyError, evcd_strcpy, b"D2", False)
+        # Port changes are passed to the wires without a vcd text round-trip.
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "example5.vcd")
+            with open("example/example5.evcd", "rb") as stream:
+                with open(filename, "wb") as output:
+                    output.write(evcd2vcd(stream).read())
+            self.assertEqual(
+                changes(WireTrace.from_vcd("example/example5.evcd").root),
+                changes(WireTrace.from_vcd(filename).root),
+            )
+        expected = WireTrace.from_vcd("example/example5.evcd")
+        with mock.patch.object(module, "PARALLEL_SIZE", 256):
+            wiretrace = WireTrace.from_vcd("example/example5.evcd", jobs=4)
+        self.assertEqual(changes(wiretrace.root), changes(expected.root))
+
+
+def changes(group):
+    """Returns the changes of every wire in a group, in order."""
+    result = [list(wire._data.items()) for wire in group.wires]
+    for subgroup in group.groups:
+        result.extend(changes(subgroup))
+    return result
+
+
+if __name__ == "__main__":
+    unittest.main()
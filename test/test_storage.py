@@ -0,0 +1,400 @@
+import contextlib, io, os, shutil, tempfile
+from sootty.__main__ import main, render
+from sootty.storage import WireTrace, ValueChange, ArrayValueChange, ValueChangeBuilder
+from sootty.storage import IntervalSet, Logic, Wire
+from sootty.storage import arraychange, cache, planner, summary, vectorized
+from sootty.parser import parser
+from sootty.storage.expressions import ExpressionCache
+
+import unittest
+from unittest import mock
+
+
+class TestStorage(unittest.TestCase):
+    def test_array_backend(self):
+        expected = WireTrace.from_vcd("example/example1.vcd", backend=ValueChange)
+        wiretrace = WireTrace.from_vcd("example/example1.vcd", backend=ArrayValueChange)
+        for name in ("D0", "D1", "Data"):
+            for time in range(wiretrace.length() + 2):
+                self.assertEqual(
+                    wiretrace.find(name)[time], expected.find(name)[time]
+                )
+        for expr in ("D1 & D2", "Data == const 3", "acc D0", "after D3"):
+            self.assertEqual(wiretrace.evaluate(expr), expected.evaluate(expr))
+
+    def test_cache_option(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = shutil.copy("example/example3.vcd", directory)
+            for flags in ([], ["--cache"]):  # the cache is only saved when asked
+                argv = ["sootty", filename, "-w", "clk", "-l", "10", "-o", *flags]
+                with mock.patch("sys.argv", argv):
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        main()
+                self.assertEqual(os.path.exists(cache.path(filename)), bool(flags))
+            # The whole trace is saved, even though only some wires are displayed.
+            wiretrace = WireTrace.from_vcd(filename, cache=True)
+            self.assertIn("pc", wiretrace.get_wire_names())
+
+    def test_load_names(self):
+        wiretrace = WireTrace.from_vcd("example/example1.vcd", names={"D1", "Data"})
+        self.assertEqual(wiretrace.get_wire_names(), {"D1", "Data"})
+        self.assertEqual(list(wiretrace.evaluate("Data == const 3")), [6, 15])
+
+    def test_array_values(self):
+        data = ArrayValueChange(width=4)
+        data[0] = 3
+        data[5] = "x"
+        data[2] = None
+        data[9] = 1 << 100  # promotes the value columns
+        self.assertEqual(list(data.keys()), [0, 2, 5, 9])
+        self.assertEqual(data.get(1), 3)
+        self.assertIsNone(data.get(4))
+        self.assertEqual(data.get(7), "xxxx")
+        self.assertEqual(data.get(10), 1 << 100)
+        self.assertEqual(data.length(), 9)
+
+    def test_builder(self):
+        builder = ValueChangeBuilder(width=8)
+        for time, value in ((0, "x"), (0, 4), (3, 5), (7, "z1"), (7, 6)):
+            builder.append(time, value)
+        for backend in (ValueChange, ArrayValueChange):
+            data = builder.freeze(backend)
+            self.assertIsInstance(data, backend)
+            self.assertEqual(list(data.items()), [(0, 4), (3, 5), (7, 6)])
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = shutil.copy("example/example3.vcd", directory)
+            expected = WireTrace.from_vcd(filename, cache=True)
+            self.assertTrue(os.path.exists(cache.path(filename)))
+            for mapped in (False, True):
+                wiretrace = WireTrace.from_vcd(filename, cache=True, cache_mmap=mapped)
+                self.assertEqual(wiretrace.metadata, expected.metadata)
+                self.assertEqual(
+                    wiretrace.get_wire_names(), expected.get_wire_names()
+                )
+                for expr in ("clk", "pc == const 4", "acc clk"):
+                    self.assertEqual(
+                        wiretrace.evaluate(expr), expected.evaluate(expr)
+                    )
+            wiretrace.find("clk")[0] = 1  # mapped columns are copied when modified
+            self.assertEqual(wiretrace.find("clk")[0], 1)
+            with open(filename, "ab") as stream:
+                stream.write(b"#100000\n1!\n")  # invalidates the cache
+            mapped = wiretrace
+            wiretrace = WireTrace.from_vcd(filename, cache=True)
+            self.assertEqual(wiretrace.length(), 100000)
+            # The cache is replaced, not rewritten under the mapped trace.
+            self.assertEqual(
+                mapped.evaluate("pc == const 4"), expected.evaluate("pc == const 4")
+            )
+            self.assertEqual(
+                sorted(os.listdir(directory)), ["example3.vcd", "example3.vcd.sootty"]
+            )
+
+    def test_refresh(self):
+        with open("example/example3.vcd", "rb") as stream:
+            buffer = stream.read()
+        expected = WireTrace.from_vcd("example/example3.vcd")
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "example3.vcd")
+            with open(filename, "wb") as stream:
+                stream.write(buffer[:20005])  # ends with a partly written line
+            wiretrace = WireTrace.from_vcd(filename)
+            self.assertFalse(wiretrace.refresh())
+            for size in (30007, 45011, len(buffer)):
+                with open(filename, "ab") as stream:
+                    stream.write(buffer[stream.tell() : size])
+                self.assertTrue(wiretrace.refresh())
+            for expr in ("clk", "pc == const 4", "acc clk"):
+                self.assertEqual(wiretrace.evaluate(expr), expected.evaluate(expr))
+
+    def test_refresh_partial_line(self):
+        header = (
+            b"$scope module top $end\n$var wire 1 ! a $end\n"
+            b"$var wire 1 !! b $end\n$upscope $end\n$enddefinitions $end\n"
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "partial.vcd")
+            with open(filename, "wb") as stream:
+                stream.write(header + b"#0\n0!\n0!!\n#5\n1!")  # `1!!` partly written
+            wiretrace = WireTrace.from_vcd(filename)
+            with open(filename, "ab") as stream:
+                stream.write(b"!\n#6\n")
+            self.assertTrue(wiretrace.refresh())
+            expected = WireTrace.from_vcd(filename)
+            for name in ("a", "b"):
+                self.assertEqual(
+                    list(wiretrace.find(name)._data.items()),
+                    list(expected.find(name)._data.items()),
+                )
+            self.assertEqual(wiretrace.find("a")[5], 0)
+
+    def test_sweep(self):
+        for backend in (ValueChange, ArrayValueChange):
+            wiretrace = WireTrace.from_vcd("example/example1.vcd", backend=backend)
+            for name in ("D0", "Data"):
+                wire = wiretrace.find(name)
+                for times in (range(-2, 25), [1, 1, 4, 9, 9, 30], []):
+                    self.assertEqual(
+                        list(wire.sweep(times)), [wire[time] for time in times]
+                    )
+
+    def test_intervals(self):
+        intervals = IntervalSet([(2, 4), (4, 6), (9, 10)])
+        self.assertEqual(list(intervals.intervals()), [(2, 6), (9, 10)])
+        self.assertEqual(list(intervals), [2, 3, 4, 5, 9])
+        self.assertEqual(len(intervals), 5)
+        self.assertEqual(intervals, IntervalSet.from_times([2, 3, 4, 5, 9]))
+        self.assertEqual((intervals.first(), intervals.first(after=5)), (2, 9))
+        self.assertIsNone(intervals.first(after=9))
+        self.assertTrue(5 in intervals and 6 not in intervals)
+        # Results scale with the number of changes, not with time.
+        wire = Wire("long")
+        wire[0] = 1
+        wire[10**12] = 0
+        self.assertEqual(
+            list(wire.times(2 * 10**12).intervals()), [(0, 10**12)]
+        )
+
+    def test_logic(self):
+        value = Logic.from_str("01xz")
+        self.assertEqual((value.value, value.mask, value.width), (0b0110, 0b0011, 4))
+        self.assertEqual(value, "01XZ")
+        self.assertEqual(value & 0b1100, 0b0100)  # known zero bits dominate
+        self.assertEqual(value | 0b0011, 0b0111)  # known one bits dominate
+        self.assertEqual(str(value ^ 0b1111), "10xx")
+        self.assertEqual(str(~value), "10xx")
+        self.assertTrue(value)
+        self.assertFalse(Logic.from_str("0x"))
+        self.assertEqual(Logic.from_str("0101"), 5)
+        for backend in (ValueChange, ArrayValueChange):
+            a = Wire("a", width=4, backend=backend)
+            b = Wire("b", width=4, backend=backend)
+            a[0], a[2] = Logic.from_str("x1", 4), 1
+            b[0] = 0b0011
+            self.assertEqual((a & b)[0], "00x1")
+            self.assertEqual((a + b)[0], "xxxxx")
+            self.assertEqual([(a & b)[2], (a + b)[2]], [1, 4])
+        # Values are printed with the width of their wire by every backend.
+        for backend in (ValueChange, ArrayValueChange):
+            a = Wire("a", width=4, backend=backend)
+            b = Wire("b", width=8, backend=backend)
+            a[0], b[0] = 3, Logic.from_str("1x0")
+            self.assertEqual(str(b[0]), "000001x0")
+            self.assertEqual(str((a ^ b ^ a)[0]), "000001x0")
+            self.assertEqual(str((a & b)[0]), "000000x0")
+
+    def test_chain(self):
+        wiretrace = WireTrace.from_vcd("example/example1.vcd")
+        d0, d1, d2, d3 = (wiretrace.find(name) for name in ("D0", "D1", "D2", "D3"))
+        for op, nested in (
+            ("&", ((d0 & d1) & d2) & d3),
+            ("|", ((d0 | d1) | d2) | d3),
+            ("^", ((d0 ^ d1) ^ d2) ^ d3),
+            ("&&", d0._logical_and(d1)._logical_and(d2)._logical_and(d3)),
+        ):
+            chain = wiretrace.compute_wire(f" {op} ".join(("D0", "D1", "D2", "D3")))
+            self.assertEqual(chain.name, nested.name)
+            self.assertEqual(list(chain._data.items()), list(nested._data.items()))
+
+    @unittest.skipIf(vectorized.numpy is None, "numpy is not installed")
+    def test_vectorized(self):
+        wiretrace = WireTrace.from_vcd("example/example1.vcd")
+        for expr in (
+            "D0 & D1 & D2",
+            "D0 || D3",
+            "Data == D1",
+            "Data >= D1",
+            "Data - D1",
+            "~Data",
+            "-Data",
+        ):
+            # The expression cache is cleared so that each path computes the wire.
+            wiretrace._expressions.clear()
+            with mock.patch.object(arraychange, "VECTORIZE_SIZE", 1 << 30):
+                expected = wiretrace.compute_wire(expr)._data
+            wiretrace._expressions.clear()
+            with mock.patch.object(
+                arraychange, "VECTORIZE_SIZE", 0
+            ), mock.patch.object(
+                vectorized, "reduce", wraps=vectorized.reduce
+            ) as reduce, mock.patch.object(
+                vectorized, "unary", wraps=vectorized.unary
+            ) as unary:
+                data = wiretrace.compute_wire(expr)._data
+            self.assertTrue(reduce.called or unary.called)  # the numpy path ran
+            self.assertEqual(list(data.items()), list(expected.items()))
+
+    def test_expression_cache(self):
+        wiretrace = WireTrace.from_vcd("example/example3.vcd")
+        counter = wiretrace.compute_wire("acc clk")
+        self.assertIs(wiretrace.compute_wire("(acc  clk)"), counter)
+        start, end = wiretrace.compute_wires("acc clk == const 10, acc clk == const 30")
+        self.assertIs(wiretrace.compute_wire("acc clk == const 10"), start)
+        self.assertEqual(list(start.times(wiretrace.length())), [20, 21])
+        # The least recently used wires are evicted first.
+        expressions = ExpressionCache(size=2 * counter._data.nbytes())
+        for name in ("a", "b", "a", "c"):
+            expressions.put(name, counter)
+        self.assertEqual((len(expressions), "b" in expressions), (2, False))
+
+    def test_shared_subexpression(self):
+        wiretrace = WireTrace.from_vcd("example/example3.vcd")
+        counted = mock.patch.object(Wire, "_acc", autospec=True, side_effect=Wire._acc)
+        with counted as acc, contextlib.redirect_stdout(io.StringIO()):
+            render(
+                wiretrace,
+                wires="clk, acc clk",
+                breakpoints="acc clk == const 15",
+                btable=True,
+                length=None,
+                start="acc clk == const 10",
+                end="acc clk == const 20",
+                output=True,
+                radix=10,
+            )
+        self.assertEqual(acc.call_count, 1)  # acc clk is computed once
+
+    def test_breakpoint_window(self):
+        # Breakpoints are listed over the whole trace, so it is loaded as a whole.
+        argv = ["sootty", "example/example1.vcd", "-s", "time 2", "-e", "time 6"]
+        argv += ["-b", "D1", "--btable", "-o"]
+        load = mock.patch.object(WireTrace, "from_vcd", wraps=WireTrace.from_vcd)
+        with mock.patch("sys.argv", argv), load as from_vcd:
+            with contextlib.redirect_stdout(io.StringIO()):
+                main()
+        self.assertEqual(from_vcd.call_args.kwargs["start"], None)
+        self.assertEqual(from_vcd.call_args.kwargs["end"], None)
+
+    def test_stream(self):
+        wiretrace = WireTrace.from_vcd("example/example1.vcd")
+        for expr in (
+            "D0 & D1 & D2",
+            "Data + D1 > const 4 || D3",
+            "acc D0 == const 2",
+            "after D2 && until D3",
+            "from D1 ^ before D0",
+            "next Data == prev Data",
+            "time 0 | time 7",
+        ):
+            wire = wiretrace.compute_wire(expr)
+            wiretrace._expressions.clear()
+            self.assertEqual(list(wiretrace.stream(expr)), list(wire._data.items()))
+            self.assertEqual(
+                wiretrace.evaluate(expr), wire.times(wiretrace.length())
+            )
+
+    def test_window(self):
+        wiretrace = WireTrace.from_vcd("example/example1.vcd")
+        for expr in ("Data + D1 > const 4", "acc D0 == const 2", "next from D2"):
+            wire = wiretrace.compute_wire(expr)
+            window = wiretrace.compute_wire(expr, 5, 12)
+            self.assertEqual(window.name, wire.name)
+            self.assertEqual(
+                list(window.sweep(range(5, 12))), list(wire.sweep(range(5, 12)))
+            )
+            self.assertEqual(
+                list(wiretrace.evaluate(expr, 5, 12)),
+                [time for time in wiretrace.evaluate(expr) if 5 <= time < 12],
+            )
+
+    def test_window_shift(self):
+        wiretrace = WireTrace.from_vcd("example/example1.vcd")
+        for expr in (
+            "2 prev (next D1)",
+            "2 next (3 prev (2 next const 4))",
+            "3 prev (2 next (const 0 < const 4))",
+            "3 prev (prev (3 prev (3 next Data)))",
+        ):
+            wire = wiretrace.compute_wire(expr)
+            times = wire.times(wiretrace.length())
+            for start, end in ((0, 5), (1, 12), (4, 9)):
+                wiretrace._expressions.clear()
+                window = wiretrace.compute_wire(expr, start, end)
+                self.assertEqual(
+                    list(window.sweep(range(start, end))),
+                    list(wire.sweep(range(start, end))),
+                )
+                self.assertEqual(
+                    list(wiretrace.evaluate(expr, start, end)),
+                    [time for time in times if start <= time < end],
+                )
+                self.assertEqual(
+                    wiretrace.first_time(expr, start), times.first(start)
+                )
+
+    def test_first_time(self):
+        wiretrace = WireTrace.from_vcd("example/example1.vcd")
+        for expr in ("D1 && D2", "acc D0 == const 2", "after D3", "time 40"):
+            for after in (None, 3, 8, 30):
+                self.assertEqual(
+                    wiretrace.first_time(expr, after),
+                    wiretrace.evaluate(expr).first(after),
+                )
+
+    def test_planner(self):
+        wiretrace = WireTrace()
+        clk, valid = Wire("clk"), Wire("valid")
+        for time in range(1000):
+            clk[time] = time % 2
+        valid[0], valid[500], valid[510] = 0, 1, 0
+        wiretrace.root.add_wire(clk)
+        wiretrace.root.add_wire(valid)
+        operands = wiretrace._chain(parser.parse("clk & valid"))
+        self.assertEqual(planner.plan(wiretrace, operands, "AND"), 1)
+        self.assertEqual(planner.plan(wiretrace, operands, "OR"), None)
+        for expr in ("clk & valid", "valid && clk", "clk | valid == const 0"):
+            wire = wiretrace.compute_wire(expr)
+            self.assertEqual(wiretrace.evaluate(expr), wire.times(wiretrace.length()))
+
+    def test_shift(self):
+        wiretrace = WireTrace.from_vcd("example/example1.vcd")
+        data = wiretrace.find("Data")
+        times = range(wiretrace.length() + 4)
+        for expr, shift in (
+            ("3 next Data", 3),
+            ("next next Data", 2),
+            ("2 prev Data", -2),
+        ):
+            wire = wiretrace.compute_wire(expr)
+            self.assertIs(wire._data._data, data._data)  # a view of the changes
+            self.assertEqual(wire._data.nbytes(), data._data.nbytes())
+            self.assertEqual(
+                list(wire.sweep(times)),
+                [data[time + shift] if time + shift >= 0 else None for time in times],
+            )
+            self.assertEqual(list(wiretrace.stream(expr)), list(wire._data.items()))
+        wire = wiretrace.compute_wire("2 prev next Data")
+        self.assertEqual(wire.name, "2 prev next Data")
+
+    def test_summary(self):
+        wiretrace = WireTrace.from_vcd("example/example3.vcd")
+        for name in ("clk", "pc", "inst", "mem_write"):
+            wire = wiretrace.find(name)
+            for start, end in ((0, 1), (0, 4096), (17, 300), (1000, 1001)):
+                values = list(wire.sweep(range(start, end)))
+                known = [value for value in values if type(value) is int]
+                changes = [time in wire._data for time in range(start + 1, end)]
+                unknown = [
+                    value is None or type(value) is Logic and value.value & value.mask
+                    for value in values
+                ]
+                self.assertEqual(
+                    wire.summary(start, end),
+                    (
+                        sum(changes),
+                        min(known, default=None),
+                        max(known, default=None),
+                        summary.X if any(unknown) else 0,
+                    ),
+                )
+        # The pyramid is rebuilt when a value is overwritten.
+        wire = wiretrace.find("pc")
+        time = wire._data.length()
+        wire[time] = 1 << 20
+        self.assertEqual(wire.summary(time, time + 1), (0, 1 << 20, 1 << 20, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()